@@ -0,0 +1,160 @@
+import asyncio
+import json
+from typing import Collection
+from typing import Dict
+from typing import Mapping
+from typing import Optional
+from typing import Tuple
+
+from starlette import status
+from starlette.types import ASGIApp
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class AdmissionQueueFullError(RuntimeError):
+    pass
+
+
+class AdmissionTimeoutError(RuntimeError):
+    pass
+
+
+class Gate:
+    """
+    Admits at most `limit` concurrent holders.
+    At most `queue_size` callers may wait for a slot,
+    and none of them waits longer than `queue_timeout` seconds.
+    """
+
+    def __init__(self, *, limit: int, queue_size: int, queue_timeout: float):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+
+        self.__semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def _semaphore(self) -> asyncio.Semaphore:
+        if self.__semaphore is None:
+            self.__semaphore = asyncio.Semaphore(self.limit)
+        return self.__semaphore
+
+    async def acquire(self) -> None:
+        semaphore = self._semaphore
+
+        if semaphore.locked():
+            if self.waiting >= self.queue_size:
+                self.rejected += 1
+                raise AdmissionQueueFullError
+
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(
+                    semaphore.acquire(),
+                    timeout=self.queue_timeout,
+                )
+            except asyncio.TimeoutError as err:
+                self.rejected += 1
+                raise AdmissionTimeoutError from err
+            finally:
+                self.waiting -= 1
+        else:
+            await semaphore.acquire()
+
+        self.active += 1
+        self.admitted += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active": self.active,
+            "admitted": self.admitted,
+            "limit": self.limit,
+            "queue_size": self.queue_size,
+            "rejected": self.rejected,
+            "waiting": self.waiting,
+        }
+
+
+class AdmissionControlMiddleware:
+    """
+    Bounds the number of concurrently served HTTP requests.
+
+    Reads (GET/HEAD/OPTIONS and POSTs to `read_paths`) and writes
+    are admitted through the "read" and "write" gates respectively,
+    so a burst of one class cannot starve the other.
+    Requests of `gate_paths` (method, path) use their own named gates.
+    Requests which cannot get a slot in time are shed with 503.
+    Long-lived streams (`exempt_paths`) bypass admission entirely.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        gates: Dict[str, Gate],
+        retry_after: int,
+        exempt_paths: Collection[str] = (),
+        read_paths: Collection[str] = (),
+        gate_paths: Optional[Mapping[Tuple[str, str], str]] = None,
+    ):
+        self.app = app
+        self.exempt_paths = frozenset(exempt_paths)
+        self.gate_paths = dict(gate_paths or {})
+        self.gates = gates
+        self.read_paths = frozenset(read_paths)
+        self.retry_after = retry_after
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        gate = self.gates[self.classify(scope)]
+
+        try:
+            await gate.acquire()
+        except (AdmissionQueueFullError, AdmissionTimeoutError):
+            await self.shed(send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
+
+    def classify(self, scope: Scope) -> str:
+        gate = self.gate_paths.get((scope["method"], scope["path"]))
+        if gate is not None:
+            return gate
+        if scope["method"] in READ_METHODS or scope["path"] in self.read_paths:
+            return "read"
+        return "write"
+
+    async def shed(self, send: Send) -> None:
+        body = json.dumps({"errors": ["service overloaded"]}).encode()
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status.HTTP_503_SERVICE_UNAVAILABLE,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(self.retry_after).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
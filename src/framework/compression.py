@@ -0,0 +1,234 @@
+import asyncio
+import gzip
+import hashlib
+from collections import OrderedDict
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+from starlette.datastructures import Headers
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp
+from starlette.types import Message
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "text/",
+)
+
+# bodies larger than this are compressed off the event loop
+OFFLOAD_SIZE = 1 << 20
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """
+    Picks the supported coding the client prefers most (the highest q),
+    br over gzip when the client has no preference between them.
+    """
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    supported = ("br", "gzip") if brotli is not None else ("gzip",)
+    qualities = {
+        coding: accepted.get(coding, accepted.get("*", 0.0))
+        for coding in supported
+    }
+
+    # max() keeps the first of equals: the order of `supported` breaks ties
+    coding = max(supported, key=qualities.__getitem__)
+    if qualities[coding] <= 0:
+        return None
+
+    return coding
+
+
+class CompressionCache:
+    """
+    LRU of compressed bodies keyed by encoding and the body digest,
+    so an unchanged payload is compressed once.
+    """
+
+    def __init__(self, *, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.__entries: "OrderedDict[Tuple[str, bytes], bytes]" = OrderedDict()
+
+    def get(self, key: Tuple[str, bytes]) -> Optional[bytes]:
+        compressed = self.__entries.get(key)
+        if compressed is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.__entries.move_to_end(key)
+        return compressed
+
+    def put(self, key: Tuple[str, bytes], compressed: bytes) -> None:
+        if self.max_entries <= 0:
+            return
+
+        self.__entries[key] = compressed
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.max_entries:
+            self.__entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self.__entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class CompressionMiddleware:
+    """
+    Compresses complete (non-streamed) responses with br or gzip,
+    whichever the client accepts.
+
+    Bodies below `minimum_size` are sent as is.
+    Compressed bodies of cacheable GET responses are kept in `cache`.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        cache: CompressionCache,
+        minimum_size: int,
+        gzip_level: int,
+        brotli_quality: int,
+    ):
+        self.app = app
+        self.brotli_quality = brotli_quality
+        self.cache = cache
+        self.gzip_level = gzip_level
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        encoding = negotiate(headers.get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _Responder(
+            self,
+            encoding=encoding,
+            cacheable=scope["method"] == "GET",
+            send=send,
+        )
+        await self.app(scope, receive, responder.send)
+
+    def compress(self, encoding: str, body: bytes) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+
+class _Responder:
+    def __init__(
+        self,
+        middleware: CompressionMiddleware,
+        *,
+        encoding: str,
+        cacheable: bool,
+        send: Send,
+    ):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.cacheable = cacheable
+        self.start: Optional[Message] = None
+        self.passthrough = False
+        self.__send = send
+
+    async def send(self, message: Message) -> None:
+        if self.passthrough:
+            await self.__send(message)
+            return
+
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+
+        if message.get("more_body", False) or not self.should_compress(
+            message.get("body", b"")
+        ):
+            # streams (e.g. SSE) and small bodies are sent untouched
+            self.passthrough = True
+            await self.__send(self.start)
+            await self.__send(message)
+            return
+
+        body = await self.compressed(message["body"])
+
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["content-encoding"] = self.encoding
+        headers["content-length"] = str(len(body))
+        headers.add_vary_header("Accept-Encoding")
+
+        await self.__send(self.start)
+        await self.__send({"type": "http.response.body", "body": body})
+
+    def should_compress(self, body: bytes) -> bool:
+        if len(body) < self.middleware.minimum_size:
+            return False
+
+        headers = Headers(raw=self.start["headers"])
+        if "content-encoding" in headers:
+            return False
+
+        content_type = headers.get("content-type", "")
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def is_cacheable(self) -> bool:
+        if not self.cacheable or self.start["status"] != 200:
+            return False
+
+        cache_control = Headers(raw=self.start["headers"]).get(
+            "cache-control", ""
+        )
+        return "no-store" not in cache_control
+
+    async def compressed(self, body: bytes) -> bytes:
+        key = None
+        if self.is_cacheable():
+            key = (self.encoding, hashlib.blake2b(body).digest())
+            compressed = self.middleware.cache.get(key)
+            if compressed is not None:
+                return compressed
+
+        if len(body) >= OFFLOAD_SIZE:
+            loop = asyncio.get_running_loop()
+            compressed = await loop.run_in_executor(
+                None, self.middleware.compress, self.encoding, body
+            )
+        else:
+            compressed = self.middleware.compress(self.encoding, body)
+
+        if key is not None:
+            self.middleware.cache.put(key, compressed)
+
+        return compressed
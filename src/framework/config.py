@@ -81,12 +81,61 @@ class DatabaseSettings(BaseSettings):
 class Settings(DatabaseSettings):
     __name__ = "Settings"
 
+    ADMISSION_QUEUE_SIZE: int = Field(default=128)
+    ADMISSION_QUEUE_TIMEOUT: float = Field(default=5.0)
+    ADMISSION_READ_LIMIT: int = Field(default=32)
+    ADMISSION_RETRY_AFTER: int = Field(default=1)
+    ADMISSION_WRITE_LIMIT: int = Field(default=8)
+    ASSIGNMENTS_GROUP_COMMIT: bool = Field(default=False)
+    ASSIGNMENTS_GROUP_COMMIT_MAX_SIZE: int = Field(default=100)
+    ASSIGNMENTS_GROUP_COMMIT_WINDOW: float = Field(default=0.005)
+    ASSIGNMENTS_PARTITIONED: bool = Field(default=False)
+    BATCH_LOOKUP_MAX_IDS: int = Field(default=1000)
+    COMPRESSION_BROTLI_QUALITY: int = Field(default=4)
+    COMPRESSION_CACHE_SIZE: int = Field(default=64)
+    COMPRESSION_GZIP_LEVEL: int = Field(default=6)
+    COMPRESSION_MINIMUM_SIZE: int = Field(default=1024)
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = Field(default=500)
+    DB_QUERY_CACHE_SIZE: int = Field(default=500)
+    EVENTS_BACKLOG_SIZE: int = Field(default=1000)
+    EVENTS_HEARTBEAT_INTERVAL: float = Field(default=15.0)
+    EVENTS_SUBSCRIBER_QUEUE_SIZE: int = Field(default=100)
+    EXACT_COUNT_CACHE_TTL: float = Field(default=60.0)
     HOST: str = Field(default="localhost")
+    IDEMPOTENCY_CACHE_SIZE: int = Field(default=10000)
+    IDEMPOTENCY_DB_STORE: bool = Field(default=False)
+    IDEMPOTENCY_PURGE_BATCH_SIZE: int = Field(default=100)
+    IDEMPOTENCY_TTL: float = Field(default=24 * 60 * 60)
+    JOBS_BACKOFF: float = Field(default=10.0)
+    JOBS_CONCURRENCY: int = Field(default=2)
+    JOBS_LEASE: float = Field(default=600.0)
+    JOBS_MAX_ATTEMPTS: int = Field(default=3)
+    JOBS_POLL_INTERVAL: float = Field(default=5.0)
+    LOOP_MONITOR: bool = Field(default=False)
+    LOOP_MONITOR_INTERVAL: float = Field(default=0.1)
+    LOOP_MONITOR_SAMPLES: int = Field(default=20)
+    LOOP_MONITOR_THRESHOLD: float = Field(default=0.2)
     MODE_DEBUG: bool = Field(default=False)
     MODE_DEBUG_SQL: bool = Field(default=False)
     PORT: int = Field(default=8000)
+    PROFILER_DIR: Optional[str] = Field()
+    PROFILER_INTERVAL: float = Field(default=0.005)
+    PROFILER_SAMPLE_RATE: float = Field(default=0.0)
+    PROFILER_WINDOW_MAX: float = Field(default=60.0)
     REQUEST_TIMEOUT: int = Field(default=30)
+    RETENTION_BATCH_SIZE: int = Field(default=1000)
+    RETENTION_DAYS: int = Field(default=365)
+    RETENTION_MODE: str = Field(default="archive", regex="^(archive|delete)$")
+    RETENTION_PAUSE: float = Field(default=0.5)
+    SEARCH_LIMIT: int = Field(default=20)
+    SEARCH_LIMIT_MAX: int = Field(default=100)
     SENTRY_DSN: Optional[str] = Field()
+    SHARED_CACHE_MAX_AGE: float = Field(default=60.0)
+    SHARED_CACHE_PATH: Optional[str] = Field()
+    SHARED_CACHE_REFRESH_INTERVAL: float = Field(default=5.0)
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE: float = Field(default=0.0)
+    SLOW_QUERY_LOG_SIZE: int = Field(default=100)
+    SLOW_QUERY_THRESHOLD: float = Field(default=0.5)
     TEST_SERVICE_URL: str = Field(default="http://localhost:8000")
     WEB_CONCURRENCY: int = Field(default=cpu_count() * 2 + 1)
 
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import time
+from contextvars import ContextVar
+from contextvars import Token
+from typing import Collection
+from typing import Optional
+
+from starlette import status
+from starlette.types import ASGIApp
+from starlette.types import Message
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+from framework.logging import logger
+
+# the moment (time.monotonic) by which the current request must be done
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceededError(TimeoutError):
+    pass
+
+
+def start(timeout: float) -> Token:
+    return _deadline.set(time.monotonic() + timeout)
+
+
+def clear() -> None:
+    """
+    Detaches the current context (e.g. of a background task
+    spawned by a request) from the request's deadline.
+    """
+    _deadline.set(None)
+
+
+def remaining() -> Optional[float]:
+    """
+    Returns seconds left until the deadline, None if there is no deadline.
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+
+    return deadline - time.monotonic()
+
+
+def check() -> Optional[float]:
+    """
+    Returns the remaining budget, raises if there is none.
+    """
+    budget = remaining()
+    if budget is not None and budget <= 0:
+        raise DeadlineExceededError
+
+    return budget
+
+
+class DeadlineMiddleware:
+    """
+    Gives every request `timeout` seconds.
+
+    The deadline is available to the code serving the request
+    (e.g. to limit its db statements). A request which has not started
+    its response by the deadline is cancelled and answered with 504.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        timeout: float,
+        exempt_paths: Collection[str] = (),
+    ):
+        self.app = app
+        self.exempt_paths = frozenset(exempt_paths)
+        self.timeout = timeout
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_tracked(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        token = start(self.timeout)
+        try:
+            await asyncio.wait_for(
+                self.app(scope, receive, send_tracked), self.timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"deadline exceeded: {scope['method']} {scope['path']}"
+            )
+            if not response_started:
+                await self.reject(send)
+        finally:
+            _deadline.reset(token)
+
+    @staticmethod
+    async def reject(send: Send) -> None:
+        body = json.dumps({"errors": ["deadline exceeded"]}).encode()
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status.HTTP_504_GATEWAY_TIMEOUT,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,95 @@
+import asyncio
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+from framework import deadlines
+
+# returns a result (or an exception to raise) per item, in the same order
+Flush = Callable[[List[Any]], Awaitable[List[Any]]]
+
+
+class GroupCommit:
+    """
+    Collects items submitted within `window` seconds of the first one
+    (at most `max_size` of them) and flushes them in one call.
+    Every submitter gets the result of its own item.
+    """
+
+    def __init__(self, flush: Flush, *, window: float, max_size: int):
+        self.flush = flush
+        self.max_size = max_size
+        self.window = window
+        self.batches = 0
+        self.items = 0
+        self.largest = 0
+        self.__pending: List[Tuple[Any, asyncio.Future]] = []
+        self.__timer: Optional[asyncio.TimerHandle] = None
+        self.__flushes: Set[asyncio.Task] = set()
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.__pending.append((item, future))
+
+        if len(self.__pending) >= self.max_size:
+            self._start_flush()
+        elif self.__timer is None:
+            self.__timer = loop.call_later(self.window, self._start_flush)
+
+        return await future
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "largest": self.largest,
+            "mean": (
+                round(self.items / self.batches, 3) if self.batches else None
+            ),
+        }
+
+    def _start_flush(self) -> None:
+        if self.__timer is not None:
+            self.__timer.cancel()
+            self.__timer = None
+
+        batch, self.__pending = self.__pending, []
+        if not batch:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._flush(batch))
+        self.__flushes.add(task)
+        task.add_done_callback(self.__flushes.discard)
+
+    async def _flush(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        # the task has copied the context of the submitter which has
+        # started it: the batch is not bound by that request's deadline
+        deadlines.clear()
+
+        self.batches += 1
+        self.items += len(batch)
+        self.largest = max(self.largest, len(batch))
+
+        try:
+            results = await self.flush([item for item, _future in batch])
+        except Exception as err:
+            results = [err] * len(batch)
+        except BaseException:
+            # cancelled (e.g. on shutdown): the submitters must not hang
+            for _item, future in batch:
+                future.cancel()
+            raise
+
+        for (_item, future), result in zip(batch, results):
+            if future.done():  # the submitter has been cancelled
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,256 @@
+import abc
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Collection
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+from starlette import status
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp
+from starlette.types import Message
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+from framework.singleflight import SingleFlight
+
+HEADER = "idempotency-key"
+MAX_KEY_LENGTH = 255
+
+
+class StoredResponse(NamedTuple):
+    fingerprint: str
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+
+class IdempotencyStore(abc.ABC):
+    @abc.abstractmethod
+    async def get(self, key: str) -> Optional[StoredResponse]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def put(self, key: str, response: StoredResponse) -> None:
+        raise NotImplementedError
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """
+    Bounded in-process LRU with TTL.
+
+    When a `backend` store is given, misses fall through to it
+    and writes go to both.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int,
+        ttl: float,
+        backend: Optional[IdempotencyStore] = None,
+    ):
+        self.backend = backend
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.__entries: "OrderedDict[str, Tuple[float, StoredResponse]]" = (
+            OrderedDict()
+        )
+
+    async def get(self, key: str) -> Optional[StoredResponse]:
+        entry = self.__entries.get(key)
+        if entry is not None:
+            expires_at, response = entry
+            if expires_at > time.monotonic():
+                self.__entries.move_to_end(key)
+                return response
+            del self.__entries[key]
+
+        if self.backend is None:
+            return None
+
+        response = await self.backend.get(key)
+        if response is not None:
+            self.remember(key, response)
+
+        return response
+
+    async def put(self, key: str, response: StoredResponse) -> None:
+        self.remember(key, response)
+
+        if self.backend is not None:
+            await self.backend.put(key, response)
+
+    def remember(self, key: str, response: StoredResponse) -> None:
+        entry = self.__entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            # the first stored response is kept until it expires
+            return
+
+        self.__entries[key] = (time.monotonic() + self.ttl, response)
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.max_entries:
+            self.__entries.popitem(last=False)
+
+
+class IdempotencyMiddleware:
+    """
+    Replays the stored response of a write request
+    repeated with the same Idempotency-Key header.
+
+    Keys are scoped by method, path and credentials.
+    Reusing a key with a different body is rejected with 422.
+    Server errors (5xx) are not stored, so they may be retried.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        store: IdempotencyStore,
+        methods: Collection[str] = ("PATCH", "POST", "PUT"),
+    ):
+        self.app = app
+        self.flights = SingleFlight()
+        self.methods = frozenset(methods)
+        self.store = store
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] not in self.methods:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        idempotency_key = headers.get(HEADER)
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            await self.reject(send, "invalid Idempotency-Key")
+            return
+
+        body = await read_body(receive)
+        fingerprint = hashlib.sha256(body).hexdigest()
+        key = self.build_key(scope, headers, idempotency_key)
+
+        stored = await self.store.get(key)
+        replayed = stored is not None
+
+        if stored is None:
+            # concurrent requests with the key share the response
+            # of the first one: a different body is rejected below
+            stored = await self.flights.do(
+                key,
+                lambda: self.execute(scope, body, key, fingerprint),
+            )
+
+        if stored.fingerprint != fingerprint:
+            await self.reject(
+                send, "Idempotency-Key is reused with a different request"
+            )
+            return
+
+        await self.replay(send, stored, replayed=replayed)
+
+    @staticmethod
+    def build_key(scope: Scope, headers: Headers, idempotency_key: str):
+        credentials = headers.get("authorization", "").encode()
+        principal = hashlib.sha256(credentials).hexdigest()
+
+        return ":".join(
+            (scope["method"], scope["path"], principal, idempotency_key)
+        )
+
+    async def execute(
+        self,
+        scope: Scope,
+        body: bytes,
+        key: str,
+        fingerprint: str,
+    ) -> StoredResponse:
+        request_sent = False
+        start: Message = {}
+        chunks = []
+
+        async def receive() -> Message:
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body}
+
+            # the response is buffered: nobody waits for a disconnect
+            await asyncio.Event().wait()
+
+        async def send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                start.update(message)
+            else:
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+
+        response = StoredResponse(
+            fingerprint=fingerprint,
+            status=start["status"],
+            headers=[tuple(header) for header in start.get("headers", [])],
+            body=b"".join(chunks),
+        )
+
+        if response.status < 500:
+            await self.store.put(key, response)
+
+        return response
+
+    @staticmethod
+    async def replay(send: Send, stored: StoredResponse, *, replayed: bool):
+        headers = [
+            (name, value)
+            for name, value in stored.headers
+            if name.lower() != b"content-length"
+        ]
+        headers.append((b"content-length", str(len(stored.body)).encode()))
+        if replayed:
+            headers.append((b"idempotent-replayed", b"true"))
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": stored.status,
+                "headers": headers,
+            }
+        )
+        await send({"type": "http.response.body", "body": stored.body})
+
+    @staticmethod
+    async def reject(send: Send, error: str) -> None:
+        body = json.dumps({"errors": [error]}).encode()
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status.HTTP_422_UNPROCESSABLE_ENTITY,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+async def read_body(receive: Receive) -> bytes:
+    chunks = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        more_body = message.get("more_body", False)
+
+    return b"".join(chunks)
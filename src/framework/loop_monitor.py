@@ -0,0 +1,135 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from datetime import timezone
+from typing import Any
+from typing import Deque
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from framework.logging import logger
+
+Sample = Dict[str, Any]
+
+
+class LoopMonitor:
+    """
+    Measures the event loop's lag: how late a callback scheduled
+    every `interval` seconds runs.
+
+    A watchdog thread samples the stack of the loop's thread
+    when the loop has not run the callback for `threshold` seconds:
+    the stack shows the code which blocks the loop.
+    """
+
+    def __init__(
+        self,
+        *,
+        interval: float,
+        threshold: float,
+        max_samples: int,
+        window: int = 100,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.blocked = 0
+        self.lag_max = 0.0
+        self.__lags: Deque[float] = deque(maxlen=window)
+        self.__samples: Deque[Sample] = deque(maxlen=max_samples)
+        self.__beat = 0.0
+        self.__loop_thread: Optional[int] = None
+        self.__task: Optional[asyncio.Task] = None
+        self.__watchdog: Optional[threading.Thread] = None
+        self.__stopped = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self.__task is not None and not self.__task.done()
+
+    def start(self) -> None:
+        if self.running:
+            return
+
+        self.__loop_thread = threading.get_ident()
+        self.__beat = time.monotonic()
+        self.__stopped.clear()
+        self.__task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self.__watchdog = threading.Thread(
+            target=self._watch, name="loop-monitor", daemon=True
+        )
+        self.__watchdog.start()
+
+    async def stop(self) -> None:
+        task, self.__task = self.__task, None
+        self.__stopped.set()
+        if task is None:
+            return
+
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+        watchdog, self.__watchdog = self.__watchdog, None
+        if watchdog is not None:
+            watchdog.join()
+
+    def samples(self) -> List[Sample]:
+        """
+        Returns the stacks of blocked loop, the most recent first.
+        """
+        return list(reversed(self.__samples))
+
+    def stats(self) -> Dict[str, Any]:
+        lags = list(self.__lags)
+        return {
+            "blocked": self.blocked,
+            "lag_last": round(lags[-1], 6) if lags else None,
+            "lag_max": round(self.lag_max, 6),
+            "lag_mean": round(sum(lags) / len(lags), 6) if lags else None,
+            "samples": self.samples(),
+        }
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.__beat = now
+
+            lag = max(now - expected, 0.0)
+            self.__lags.append(lag)
+            self.lag_max = max(self.lag_max, lag)
+            if lag >= self.threshold:
+                self.blocked += 1
+
+    def _watch(self) -> None:
+        reported = None
+        while not self.__stopped.wait(self.interval):
+            beat = self.__beat
+            stalled = time.monotonic() - beat - self.interval
+            # one sample per stall: the beat changes once the loop is free
+            if stalled < self.threshold or beat == reported:
+                continue
+
+            reported = beat
+            frame = sys._current_frames().get(self.__loop_thread)
+            if frame is None:
+                continue
+
+            sample = {
+                "at": datetime.now(timezone.utc).isoformat(),
+                "stalled_ms": round(stalled * 1000, 3),
+                "stack": traceback.format_stack(frame),
+            }
+            self.__samples.append(sample)
+            logger.warning(
+                f"event loop is blocked for {sample['stalled_ms']} ms at:\n"
+                + "".join(sample["stack"][-5:])
+            )
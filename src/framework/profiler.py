@@ -0,0 +1,265 @@
+import asyncio
+import functools
+import itertools
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Awaitable
+from typing import Callable
+from typing import Collection
+from typing import Optional
+from typing import Set
+from weakref import WeakSet
+
+from starlette.types import ASGIApp
+from starlette.types import Message
+from starlette.types import Receive
+from starlette.types import Scope
+from starlette.types import Send
+
+from framework.logging import logger
+
+HEADER = "x-profile"
+
+
+class Profile:
+    """
+    Collapsed stacks sampled while the profile is active:
+    of the given task and the tasks it spawns,
+    or of everything the loop runs.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        path: Path,
+        task: Optional[asyncio.Task] = None,
+    ):
+        self.name = name
+        self.path = path
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self.tasks: Optional[WeakSet] = None if task is None else WeakSet()
+        if task is not None:
+            self.tasks.add(task)
+
+    def covers(self, task: Optional[asyncio.Task]) -> bool:
+        return self.tasks is None or task in self.tasks
+
+    def format(self) -> str:
+        """
+        One "root;...;leaf count" line per stack:
+        the input of flamegraph.pl, speedscope and the like.
+        """
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+
+# the profile of the current request: tasks spawned within it
+# (e.g. single-flight executions) are sampled into it too
+_current: ContextVar[Optional[Profile]] = ContextVar("profile", default=None)
+
+
+def _spawn(loop, coro, *, factory=None, **kwargs) -> asyncio.Task:
+    """
+    Creates tasks of the loop, adds each to the profile of its creator.
+    """
+    if factory is not None:
+        task = factory(loop, coro, **kwargs)
+    else:
+        task = asyncio.Task(coro, loop=loop, **kwargs)
+
+    profile = _current.get()
+    if profile is not None and profile.tasks is not None:
+        profile.tasks.add(task)
+
+    return task
+
+
+def install_task_factory(loop: asyncio.AbstractEventLoop) -> None:
+    factory = loop.get_task_factory()
+    if getattr(factory, "func", None) is _spawn:
+        return
+
+    loop.set_task_factory(functools.partial(_spawn, factory=factory))
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of the event loop's thread every `interval` seconds
+    from another thread, while there are active profiles.
+
+    Profiles are written to `directory` as collapsed stacks.
+    """
+
+    def __init__(self, *, directory: Path, interval: float):
+        self.directory = directory
+        self.interval = interval
+        self.__loop: Optional[asyncio.AbstractEventLoop] = None
+        self.__loop_thread: Optional[int] = None
+        self.__lock = threading.Lock()
+        self.__serial = itertools.count(1)
+        self.__profiles: Set[Profile] = set()
+        self.__sampler: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self.__sampler is not None and self.__sampler.is_alive()
+
+    def begin(self, name: str, *, task: Optional[asyncio.Task] = None):
+        self.__loop = asyncio.get_running_loop()
+        self.__loop_thread = threading.get_ident()
+        install_task_factory(self.__loop)
+
+        stamp = time.strftime("%Y%m%dT%H%M%S")
+        slug = re.sub(r"[^\w.-]+", "-", name).strip("-")
+        serial = next(self.__serial)
+        profile = Profile(
+            name,
+            path=self.directory
+            / f"{stamp}-{os.getpid()}-{serial}-{slug}.collapsed",
+            task=task,
+        )
+        with self.__lock:
+            self.__profiles.add(profile)
+            if not self.running:
+                self.__sampler = threading.Thread(
+                    target=self._sample, name="profiler", daemon=True
+                )
+                self.__sampler.start()
+
+        return profile
+
+    async def end(self, profile: Profile) -> Path:
+        with self.__lock:
+            self.__profiles.discard(profile)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.write, profile)
+
+    def start_window(self, seconds: float) -> Path:
+        """
+        Profiles everything the loop runs for `seconds`,
+        returns the path the profile is going to be written to.
+        """
+        profile = self.begin(f"window-{seconds:g}s")
+
+        async def finish():
+            await asyncio.sleep(seconds)
+            await self.end(profile)
+
+        asyncio.get_running_loop().create_task(finish())
+
+        return profile.path
+
+    @staticmethod
+    def write(profile: Profile) -> Path:
+        profile.path.parent.mkdir(parents=True, exist_ok=True)
+        profile.path.write_text(profile.format())
+        logger.info(
+            f"profile {profile.name}:"
+            f" {profile.samples} samples in {profile.path}"
+        )
+        return profile.path
+
+    def _sample(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            with self.__lock:
+                profiles = list(self.__profiles)
+                if not profiles:
+                    self.__sampler = None
+                    return
+
+            frame = sys._current_frames().get(self.__loop_thread)
+            if frame is None:
+                continue
+
+            stack = collapse(frame)
+            task = asyncio.current_task(self.__loop)
+            for profile in profiles:
+                if profile.covers(task):
+                    profile.samples += 1
+                    profile.stacks[stack] += 1
+
+
+def collapse(frame) -> str:
+    names = []
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "?")
+        names.append(f"{module}.{frame.f_code.co_name}")
+        frame = frame.f_back
+
+    return ";".join(reversed(names))
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests which have the X-Profile header
+    and are allowed by `authorize`,
+    and a random `sample_rate` share of all requests.
+
+    The response has the X-Profile header with the name of the profile.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        profiler: SamplingProfiler,
+        authorize: Callable[[Scope], Awaitable[bool]],
+        sample_rate: float = 0.0,
+        exempt_paths: Collection[str] = (),
+    ):
+        self.app = app
+        self.authorize = authorize
+        self.exempt_paths = frozenset(exempt_paths)
+        self.profiler = profiler
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        if not await self.selected(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = self.profiler.begin(
+            f"{scope['method']} {scope['path']}",
+            task=asyncio.current_task(),
+        )
+        name = profile.path.name.encode()
+
+        async def send_named(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((HEADER.encode(), name))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _current.set(profile)
+        try:
+            await self.app(scope, receive, send_named)
+        finally:
+            _current.reset(token)
+            await self.profiler.end(profile)
+
+    async def selected(self, scope: Scope) -> bool:
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+
+        for header, _value in scope["headers"]:
+            if header == HEADER.encode():
+                return await self.authorize(scope)
+
+        return False
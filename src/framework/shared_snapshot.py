@@ -0,0 +1,138 @@
+import mmap
+import os
+import struct
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+from typing import Iterator
+from typing import Optional
+from typing import Tuple
+from uuid import UUID
+
+MAGIC = b"GSN1"
+
+# magic, version, written at (unix time), number of records
+HEADER = struct.Struct("<4sQdI")
+
+# key, offset of the value from the start of the file, length of the value
+ENTRY = struct.Struct("<16sQI")
+
+
+def write_snapshot(path: Path, *, version: int, records: Dict[UUID, bytes]):
+    """
+    Writes records sorted by key, so readers may look them up
+    with a binary search right in the mapped file.
+
+    The file is replaced atomically: readers keep the snapshot they have
+    mapped and see the new one once they reopen the path.
+    """
+    keys = sorted(records, key=lambda key: key.bytes)
+
+    offset = HEADER.size + ENTRY.size * len(keys)
+    index = []
+    for key in keys:
+        index.append(ENTRY.pack(key.bytes, offset, len(records[key])))
+        offset += len(records[key])
+
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as stream:
+            stream.write(HEADER.pack(MAGIC, version, time.time(), len(keys)))
+            stream.writelines(index)
+            stream.writelines(records[key] for key in keys)
+            stream.flush()
+            os.fsync(stream.fileno())
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class SnapshotReader:
+    """
+    Reads a snapshot written by `write_snapshot`.
+
+    The file is memory-mapped: every process on the host shares
+    the same pages of the page cache instead of keeping its own copy.
+    A replaced file is picked up on the next access.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.count = 0
+        self.version = 0
+        self.written_at = 0.0
+        self.__inode: Optional[int] = None
+        self.__map: Optional[mmap.mmap] = None
+
+    def refresh(self) -> bool:
+        """
+        Maps the current file if it has been replaced.
+        Returns whether there is a snapshot.
+        """
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            self.close()
+            return False
+
+        if inode == self.__inode:
+            return True
+
+        with open(self.path, "rb") as stream:
+            mapped = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+            inode = os.fstat(stream.fileno()).st_ino
+
+        magic, version, written_at, count = HEADER.unpack_from(mapped)
+        if magic != MAGIC:
+            mapped.close()
+            raise ValueError(f"{self.path} is not a snapshot")
+
+        self.close()
+        self.__map = mapped
+        self.__inode = inode
+        self.count = count
+        self.version = version
+        self.written_at = written_at
+
+        return True
+
+    def close(self) -> None:
+        mapped, self.__map = self.__map, None
+        self.__inode = None
+        self.count = 0
+        self.version = 0
+        self.written_at = 0.0
+        if mapped is not None:
+            mapped.close()
+
+    def age(self) -> float:
+        return time.time() - self.written_at
+
+    def get(self, key: UUID) -> Optional[bytes]:
+        if self.__map is None:
+            return None
+
+        wanted = key.bytes
+        lo, hi = 0, self.count
+        while lo < hi:
+            middle = (lo + hi) // 2
+            found, offset, length = self._entry(middle)
+            if found == wanted:
+                return self.__map[offset : offset + length]
+            if found < wanted:
+                lo = middle + 1
+            else:
+                hi = middle
+
+        return None
+
+    def items(self) -> Iterator[Tuple[UUID, bytes]]:
+        for i in range(self.count):
+            key, offset, length = self._entry(i)
+            yield UUID(bytes=key), self.__map[offset : offset + length]
+
+    def _entry(self, i: int) -> Tuple[bytes, int, int]:
+        return ENTRY.unpack_from(self.__map, HEADER.size + ENTRY.size * i)
@@ -0,0 +1,65 @@
+import asyncio
+import functools
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import Hashable
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into a single execution.
+
+    The first caller (the leader) starts the call,
+    every caller arriving while it is in flight awaits the same result.
+    Nothing is cached: once the call completes the key is forgotten.
+    """
+
+    def __init__(self):
+        self.__flights: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.executions = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+
+        flight = self.__flights.get(key)
+        if flight is None:
+            self.executions += 1
+            flight = asyncio.ensure_future(fn())
+            self.__flights[key] = flight
+            flight.add_done_callback(functools.partial(self._land, key))
+
+        # a cancelled caller must not cancel the call shared with others
+        return await asyncio.shield(flight)
+
+    def _land(self, key: Hashable, flight: asyncio.Task) -> None:
+        if self.__flights.get(key) is flight:
+            del self.__flights[key]
+
+        if not flight.cancelled():
+            # mark the exception as retrieved even if all callers are gone
+            flight.exception()
+
+    def coalesce(self, fn: Callable[..., Awaitable[T]]):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs) -> T:
+            key = (fn.__qualname__, args, tuple(sorted(kwargs.items())))
+            return await self.do(key, lambda: fn(*args, **kwargs))
+
+        return wrapper
+
+    def stats(self) -> Dict[str, Any]:
+        shared = self.calls - self.executions
+        ratio = shared / self.calls if self.calls else 0.0
+
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "ratio": round(ratio, 4),
+            "shared": shared,
+        }
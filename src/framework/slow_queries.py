@@ -0,0 +1,216 @@
+import json
+import random
+import sys
+import time
+from collections import deque
+from datetime import datetime
+from datetime import timezone
+from typing import Any
+from typing import Deque
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import Select
+
+from framework.logging import logger
+
+try:
+    import greenlet
+except ImportError:  # greenlet comes with the asyncio extension only
+    greenlet = None
+
+REDACTED = "***"
+SECRET_PARAMETERS = ("password",)
+
+MAX_PARAMETER_LENGTH = 200
+
+Entry = Dict[str, Any]
+
+
+class SlowQueryLog:
+    """
+    Records statements which take longer than `threshold` seconds
+    with their parameters and the function of `caller_prefixes`
+    modules which has executed them.
+
+    A `sample_rate` share of slow read-only SELECTs are explained
+    with EXPLAIN (ANALYZE, BUFFERS): they are executed once more.
+    """
+
+    def __init__(
+        self,
+        *,
+        threshold: float,
+        sample_rate: float,
+        max_entries: int,
+        caller_prefixes: Tuple[str, ...] = ("main.",),
+    ):
+        self.caller_prefixes = caller_prefixes
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.__entries: Deque[Entry] = deque(maxlen=max_entries)
+
+    def install(self, engine: Engine) -> None:
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+
+    def uninstall(self, engine: Engine) -> None:
+        event.remove(engine, "before_cursor_execute", self._before)
+        event.remove(engine, "after_cursor_execute", self._after)
+
+    def recent(self) -> List[Entry]:
+        """
+        Returns the recorded statements, the most recent first.
+        """
+        return list(reversed(self.__entries))
+
+    def _before(self, conn, cursor, statement, parameters, context, many):
+        context._slow_query_started = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, many):
+        started = getattr(context, "_slow_query_started", None)
+        if started is None:
+            return
+
+        duration = time.perf_counter() - started
+        if duration < self.threshold:
+            return
+
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "caller": self.find_caller(),
+            "duration_ms": round(duration * 1000, 3),
+            "parameters": None if many else named(context, parameters),
+            "statement": statement,
+        }
+
+        if (
+            not many
+            and read_only(context)
+            and random.random() < self.sample_rate
+        ):
+            entry["plan"] = explain(conn, statement, parameters)
+
+        self.__entries.append(entry)
+        logger.warning(
+            f"slow query: {entry['duration_ms']} ms"
+            f" in {entry['caller']}: {statement}"
+        )
+
+    def find_caller(self) -> Optional[str]:
+        for frame in frames():
+            module = frame.f_globals.get("__name__", "")
+            if module.startswith(self.caller_prefixes):
+                return f"{module}.{frame.f_code.co_name}:{frame.f_lineno}"
+
+        return None
+
+
+def frames():
+    """
+    Yields the frames of the current stack, innermost first.
+
+    Under the asyncio extension statements are executed in a greenlet:
+    its stack ends at the call into SQLAlchemy, the application's
+    coroutines are suspended in the parent greenlet.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        yield frame
+        frame = frame.f_back
+
+    if greenlet is None:
+        return
+
+    parent = greenlet.getcurrent().parent
+    frame = parent.gr_frame if parent is not None else None
+    while frame is not None:
+        yield frame
+        frame = frame.f_back
+
+
+def named(context, parameters) -> Any:
+    """
+    Returns parameters by their names where the names are known,
+    with secrets redacted and long values shortened.
+    """
+    if not isinstance(parameters, dict):
+        names = getattr(context.compiled, "positiontup", None)
+        if not names or len(names) != len(parameters):
+            return [shorten(value) for value in parameters]
+        parameters = dict(zip(names, parameters))
+
+    return {
+        name: (
+            REDACTED
+            if any(secret in name for secret in SECRET_PARAMETERS)
+            else shorten(value)
+        )
+        for name, value in parameters.items()
+    }
+
+
+def shorten(value: Any) -> Any:
+    if isinstance(value, (bool, int, float)) or value is None:
+        return value
+
+    value = str(value)
+    if len(value) > MAX_PARAMETER_LENGTH:
+        value = value[:MAX_PARAMETER_LENGTH] + "..."
+
+    return value
+
+
+def read_only(context) -> bool:
+    """
+    Tells whether the statement is a compiled SELECT without FOR UPDATE.
+
+    Textual statements are never taken for reads:
+    "select pg_notify(...)" or "select set_config(...)" are not.
+    """
+    compiled = getattr(context, "compiled", None)
+    if compiled is None or not isinstance(compiled.statement, Select):
+        return False
+
+    if context.isinsert or context.isupdate or context.isdelete:
+        return False
+
+    return compiled.statement._for_update_arg is None
+
+
+def explain(conn, statement: str, parameters) -> Any:
+    """
+    Runs EXPLAIN ANALYZE on a new cursor of the same DBAPI connection,
+    within a read-only savepoint which is always rolled back:
+    nothing the statement does survives, a failure does not break
+    the transaction.
+    """
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute("savepoint slow_query_explain")
+        try:
+            cursor.execute("set local transaction_read_only = on")
+            cursor.execute(
+                f"explain (analyze, buffers, format json) {statement}",
+                parameters,
+            )
+            plan = cursor.fetchone()[0]
+        except Exception as err:
+            logger.warning(f"slow query is not explained: {err}")
+            plan = None
+        finally:
+            cursor.execute("rollback to savepoint slow_query_explain")
+    finally:
+        cursor.close()
+
+    if plan is None:
+        return None
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    return plan
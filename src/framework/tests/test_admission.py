@@ -0,0 +1,119 @@
+import asyncio
+
+import httpx
+import pytest
+from starlette import status
+from starlette.responses import PlainTextResponse
+
+from framework.admission import AdmissionControlMiddleware
+from framework.admission import Gate
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.unit,
+]
+
+
+def build_app(*, queue_size: int, queue_timeout: float, gate_paths=None):
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+        await release.wait()
+        response = PlainTextResponse("ok")
+        await response(scope, receive, send)
+
+    gates = {
+        "read": Gate(
+            limit=1,
+            queue_size=queue_size,
+            queue_timeout=queue_timeout,
+        ),
+        "write": Gate(
+            limit=1,
+            queue_size=queue_size,
+            queue_timeout=queue_timeout,
+        ),
+        "batched": Gate(
+            limit=2,
+            queue_size=queue_size,
+            queue_timeout=queue_timeout,
+        ),
+    }
+
+    middleware = AdmissionControlMiddleware(
+        app, gates=gates, gate_paths=gate_paths, retry_after=3
+    )
+
+    return middleware, release
+
+
+async def test_sheds_when_queue_is_full():
+    app, release = build_app(queue_size=0, queue_timeout=1)
+
+    async with httpx.AsyncClient(app=app, base_url="http://asgi") as client:
+        first = asyncio.create_task(client.get("/"))
+        await asyncio.sleep(0.01)
+
+        resp = await client.get("/")
+        assert resp.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert resp.headers["retry-after"] == "3"
+        assert resp.json() == {"errors": ["service overloaded"]}
+
+        release.set()
+        resp = await first
+        assert resp.status_code == status.HTTP_200_OK
+
+    assert app.gates["read"].stats()["rejected"] == 1
+    assert app.gates["read"].stats()["admitted"] == 1
+
+
+async def test_sheds_after_queue_timeout():
+    app, release = build_app(queue_size=1, queue_timeout=0.05)
+
+    async with httpx.AsyncClient(app=app, base_url="http://asgi") as client:
+        first = asyncio.create_task(client.get("/"))
+        await asyncio.sleep(0.01)
+
+        resp = await client.get("/")
+        assert resp.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+        release.set()
+        await first
+
+
+async def test_reads_and_writes_use_separate_gates():
+    app, release = build_app(queue_size=0, queue_timeout=1)
+
+    async with httpx.AsyncClient(app=app, base_url="http://asgi") as client:
+        read = asyncio.create_task(client.get("/"))
+        write = asyncio.create_task(client.put("/"))
+        await asyncio.sleep(0.01)
+
+        assert app.gates["read"].active == 1
+        assert app.gates["write"].active == 1
+
+        release.set()
+        assert (await read).status_code == status.HTTP_200_OK
+        assert (await write).status_code == status.HTTP_200_OK
+
+
+async def test_gate_paths_use_their_own_gate():
+    app, release = build_app(
+        queue_size=0,
+        queue_timeout=1,
+        gate_paths={("PUT", "/batched"): "batched"},
+    )
+
+    async with httpx.AsyncClient(app=app, base_url="http://asgi") as client:
+        batched = [
+            asyncio.create_task(client.put("/batched")) for _ in range(2)
+        ]
+        write = asyncio.create_task(client.put("/"))
+        await asyncio.sleep(0.01)
+
+        assert app.gates["batched"].active == 2
+        assert app.gates["write"].active == 1
+
+        release.set()
+        for resp in await asyncio.gather(*batched, write):
+            assert resp.status_code == status.HTTP_200_OK
@@ -0,0 +1,110 @@
+import gzip
+
+import httpx
+import pytest
+from starlette.responses import JSONResponse
+from starlette.responses import PlainTextResponse
+from starlette.responses import StreamingResponse
+
+from framework import compression
+from framework.compression import CompressionCache
+from framework.compression import CompressionMiddleware
+from framework.compression import negotiate
+
+pytestmark = [
+    pytest.mark.unit,
+]
+
+PAYLOAD = {"data": [{"name": f"user {i}"} for i in range(100)]}
+
+
+def build_app():
+    async def app(scope, receive, send):
+        if scope["path"] == "/small":
+            response = PlainTextResponse("ok")
+        elif scope["path"] == "/stream":
+
+            async def chunks():
+                yield "data: 1\n\n" * 200
+                yield "data: 2\n\n" * 200
+
+            response = StreamingResponse(
+                chunks(), media_type="text/event-stream"
+            )
+        else:
+            response = JSONResponse(PAYLOAD)
+        await response(scope, receive, send)
+
+    cache = CompressionCache(max_entries=2)
+    middleware = CompressionMiddleware(
+        app,
+        cache=cache,
+        minimum_size=100,
+        gzip_level=6,
+        brotli_quality=4,
+    )
+
+    return middleware, cache
+
+
+def test_negotiate():
+    assert negotiate("") is None
+    assert negotiate("identity") is None
+    assert negotiate("gzip") == "gzip"
+    assert negotiate("deflate, gzip;q=0.5") == "gzip"
+    assert negotiate("gzip;q=0") is None
+    assert negotiate("*") in {"br", "gzip"}
+    assert negotiate("br;q=0.1, gzip;q=1.0") == "gzip"
+    assert negotiate("gzip;q=0.5, *;q=0.8") in {"br", "gzip"}
+
+
+def test_negotiate_prefers_br_on_ties(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", object())
+
+    assert negotiate("gzip, br") == "br"
+    assert negotiate("gzip;q=0.5, br;q=0.5") == "br"
+    assert negotiate("gzip;q=0.9, br;q=0.5") == "gzip"
+    assert negotiate("br;q=0, gzip") == "gzip"
+    assert negotiate("gzip;q=0.5, *;q=0.8") == "br"
+
+
+@pytest.mark.asyncio
+async def test_compresses_and_caches():
+    app, cache = build_app()
+
+    async with httpx.AsyncClient(app=app, base_url="http://asgi") as client:
+        for _ in range(3):
+            resp = await client.get("/", headers={"accept-encoding": "gzip"})
+            assert resp.headers["content-encoding"] == "gzip"
+            assert resp.headers["vary"] == "Accept-Encoding"
+            assert resp.json() == PAYLOAD
+
+        resp = await client.get("/", headers={"accept-encoding": "identity"})
+        assert "content-encoding" not in resp.headers
+        assert resp.json() == PAYLOAD
+
+    assert cache.stats() == {"entries": 1, "hits": 2, "misses": 1}
+
+
+@pytest.mark.asyncio
+async def test_skips_small_and_streamed_bodies():
+    app, cache = build_app()
+
+    async with httpx.AsyncClient(app=app, base_url="http://asgi") as client:
+        resp = await client.get("/small", headers={"accept-encoding": "gzip"})
+        assert "content-encoding" not in resp.headers
+        assert resp.text == "ok"
+
+        resp = await client.get("/stream", headers={"accept-encoding": "gzip"})
+        assert "content-encoding" not in resp.headers
+        assert resp.text.startswith("data: 1")
+
+    assert cache.stats()["entries"] == 0
+
+
+def test_gzip_is_deterministic():
+    app, _cache = build_app()
+
+    body = b"x" * 1000
+    assert app.compress("gzip", body) == app.compress("gzip", body)
+    assert gzip.decompress(app.compress("gzip", body)) == body
@@ -0,0 +1,70 @@
+import asyncio
+
+import httpx
+import pytest
+from starlette import status
+from starlette.responses import PlainTextResponse
+
+from framework import deadlines
+from framework.deadlines import DeadlineMiddleware
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.unit,
+]
+
+
+def build_app(delay: float):
+    budgets = []
+
+    async def app(scope, receive, send):
+        budgets.append(deadlines.remaining())
+        await asyncio.sleep(delay)
+        response = PlainTextResponse("ok")
+        await response(scope, receive, send)
+
+    middleware = DeadlineMiddleware(app, timeout=0.1, exempt_paths={"/stream"})
+
+    return middleware, budgets
+
+
+async def test_request_within_deadline():
+    app, budgets = build_app(delay=0)
+
+    async with httpx.AsyncClient(app=app, base_url="http://asgi") as client:
+        resp = await client.get("/")
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert 0 < budgets[0] <= 0.1
+    assert deadlines.remaining() is None
+
+
+async def test_request_past_deadline():
+    app, _budgets = build_app(delay=1)
+
+    async with httpx.AsyncClient(app=app, base_url="http://asgi") as client:
+        resp = await client.get("/")
+
+    assert resp.status_code == status.HTTP_504_GATEWAY_TIMEOUT
+    assert resp.json() == {"errors": ["deadline exceeded"]}
+
+
+async def test_exempt_path_has_no_deadline():
+    app, budgets = build_app(delay=0.2)
+
+    async with httpx.AsyncClient(app=app, base_url="http://asgi") as client:
+        resp = await client.get("/stream")
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert budgets == [None]
+
+
+async def test_check():
+    token = deadlines.start(-1)
+    try:
+        with pytest.raises(deadlines.DeadlineExceededError):
+            deadlines.check()
+    finally:
+        deadlines._deadline.reset(token)
+
+    assert deadlines.check() is None
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from framework import deadlines
+from framework.group_commit import GroupCommit
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.unit,
+]
+
+
+def build(window: float = 0.01, max_size: int = 100):
+    batches = []
+
+    async def flush(items):
+        batches.append((items, deadlines.remaining()))
+        return [ValueError(item) if item < 0 else item * 10 for item in items]
+
+    return GroupCommit(flush, window=window, max_size=max_size), batches
+
+
+async def test_items_within_window_are_flushed_together():
+    group, batches = build()
+
+    results = await asyncio.gather(
+        *(group.submit(i) for i in range(5)), return_exceptions=True
+    )
+
+    assert results == [0, 10, 20, 30, 40]
+    assert [items for items, _budget in batches] == [[0, 1, 2, 3, 4]]
+    assert group.stats() == {
+        "batches": 1,
+        "items": 5,
+        "largest": 5,
+        "mean": 5.0,
+    }
+
+
+async def test_full_batch_is_flushed_at_once():
+    group, batches = build(window=10, max_size=2)
+
+    results = await asyncio.wait_for(
+        asyncio.gather(group.submit(1), group.submit(2)), 1
+    )
+
+    assert results == [10, 20]
+    assert len(batches) == 1
+
+
+async def test_errors_are_raised_to_their_submitters():
+    group, _batches = build()
+
+    ok, failed = await asyncio.gather(
+        group.submit(1), group.submit(-1), return_exceptions=True
+    )
+
+    assert ok == 10
+    assert isinstance(failed, ValueError)
+
+
+async def test_failed_flush_is_raised_to_all():
+    async def flush(items):
+        raise RuntimeError("db is down")
+
+    group = GroupCommit(flush, window=0.01, max_size=100)
+    results = await asyncio.gather(
+        group.submit(1), group.submit(2), return_exceptions=True
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+async def test_flush_is_not_bound_by_submitters_deadline():
+    group, batches = build()
+
+    token = deadlines.start(5)
+    try:
+        assert await group.submit(1) == 10
+    finally:
+        deadlines._deadline.reset(token)
+
+    assert batches == [([1], None)]
+
+
+async def test_cancelled_flush_cancels_submitters():
+    async def flush(items):
+        raise asyncio.CancelledError()
+
+    group = GroupCommit(flush, window=0.01, max_size=100)
+
+    results = await asyncio.wait_for(
+        asyncio.gather(
+            group.submit(1), group.submit(2), return_exceptions=True
+        ),
+        1,
+    )
+
+    assert all(isinstance(r, asyncio.CancelledError) for r in results)
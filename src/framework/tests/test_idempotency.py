@@ -0,0 +1,89 @@
+import asyncio
+
+import httpx
+import pytest
+from starlette import status
+from starlette.responses import PlainTextResponse
+
+from framework.idempotency import IdempotencyMiddleware
+from framework.idempotency import MemoryIdempotencyStore
+from framework.idempotency import StoredResponse
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.unit,
+]
+
+RESPONSE = StoredResponse(fingerprint="f", status=200, headers=[], body=b"")
+
+
+async def test_memory_store_is_bounded():
+    store = MemoryIdempotencyStore(max_entries=2, ttl=60)
+
+    for key in "abc":
+        await store.put(key, RESPONSE)
+
+    assert await store.get("a") is None
+    assert await store.get("b") == RESPONSE
+    assert await store.get("c") == RESPONSE
+
+
+async def test_memory_store_expires_entries():
+    store = MemoryIdempotencyStore(max_entries=2, ttl=-1)
+
+    await store.put("a", RESPONSE)
+
+    assert await store.get("a") is None
+
+
+async def test_memory_store_falls_back_to_backend():
+    backend = MemoryIdempotencyStore(max_entries=2, ttl=60)
+    store = MemoryIdempotencyStore(max_entries=2, ttl=60, backend=backend)
+
+    await store.put("a", RESPONSE)
+    assert await backend.get("a") == RESPONSE
+
+    await backend.put("b", RESPONSE)
+    assert await store.get("b") == RESPONSE
+
+
+async def test_memory_store_keeps_first_response():
+    store = MemoryIdempotencyStore(max_entries=2, ttl=60)
+    other = RESPONSE._replace(fingerprint="other")
+
+    await store.put("a", RESPONSE)
+    await store.put("a", other)
+
+    assert await store.get("a") == RESPONSE
+
+
+async def test_concurrent_requests_with_different_bodies():
+    calls = []
+
+    async def app(scope, receive, send):
+        message = await receive()
+        calls.append(message["body"])
+        await asyncio.sleep(0.05)
+        response = PlainTextResponse("created")
+        await response(scope, receive, send)
+
+    store = MemoryIdempotencyStore(max_entries=10, ttl=60)
+    middleware = IdempotencyMiddleware(app, store=store)
+
+    async with httpx.AsyncClient(
+        app=middleware, base_url="http://asgi"
+    ) as client:
+
+        def post(body: bytes):
+            return client.post(
+                "/items", content=body, headers={"Idempotency-Key": "k"}
+            )
+
+        first, second = await asyncio.gather(post(b"a"), post(b"b"))
+        retried = await post(b"a")
+
+    assert calls == [b"a"]
+    assert first.status_code == status.HTTP_200_OK
+    assert second.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert retried.status_code == status.HTTP_200_OK
+    assert retried.headers["idempotent-replayed"] == "true"
@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+import pytest
+
+from framework.loop_monitor import LoopMonitor
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.unit,
+]
+
+
+def block_the_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+async def test_idle_loop():
+    monitor = LoopMonitor(interval=0.01, threshold=0.1, max_samples=5)
+    monitor.start()
+    await asyncio.sleep(0.1)
+    await monitor.stop()
+
+    stats = monitor.stats()
+    assert not monitor.running
+    assert stats["blocked"] == 0
+    assert stats["lag_mean"] is not None
+    assert stats["samples"] == []
+
+
+async def test_blocked_loop_is_sampled():
+    monitor = LoopMonitor(interval=0.01, threshold=0.05, max_samples=5)
+    monitor.start()
+    await asyncio.sleep(0.03)
+    block_the_loop(0.2)
+    await asyncio.sleep(0.03)
+    await monitor.stop()
+
+    stats = monitor.stats()
+    assert stats["blocked"] == 1
+    assert stats["lag_max"] >= 0.15
+
+    assert len(stats["samples"]) == 1
+    assert stats["samples"][0]["stalled_ms"] >= 50
+    assert "block_the_loop" in "".join(stats["samples"][0]["stack"])
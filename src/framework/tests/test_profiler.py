@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from starlette import status
+from starlette.responses import PlainTextResponse
+
+from framework.profiler import ProfilingMiddleware
+from framework.profiler import SamplingProfiler
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.unit,
+]
+
+
+def busy(seconds: float) -> None:
+    finish = time.monotonic() + seconds
+    while time.monotonic() < finish:
+        pass
+
+
+def build_app(profiler: SamplingProfiler, allowed: bool):
+    async def app(scope, receive, send):
+        busy(0.1)
+        response = PlainTextResponse("ok")
+        await response(scope, receive, send)
+
+    async def authorize(scope) -> bool:
+        return allowed
+
+    return ProfilingMiddleware(app, profiler=profiler, authorize=authorize)
+
+
+async def test_profiled_request(tmp_path):
+    profiler = SamplingProfiler(directory=tmp_path, interval=0.001)
+    app = build_app(profiler, allowed=True)
+
+    async with httpx.AsyncClient(app=app, base_url="http://asgi") as client:
+        resp = await client.get("/items", headers={"X-Profile": "1"})
+
+    assert resp.status_code == status.HTTP_200_OK
+    name = resp.headers["X-Profile"]
+    assert name.endswith("-GET-items.collapsed")
+
+    profile = (tmp_path / name).read_text()
+    assert "test_profiler.busy" in profile
+    for line in profile.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+
+
+@pytest.mark.parametrize(
+    "headers,allowed", [({}, True), ({"X-Profile": "1"}, False)]
+)
+async def test_not_profiled_request(tmp_path, headers, allowed):
+    profiler = SamplingProfiler(directory=tmp_path, interval=0.001)
+    app = build_app(profiler, allowed=allowed)
+
+    async with httpx.AsyncClient(app=app, base_url="http://asgi") as client:
+        resp = await client.get("/items", headers=headers)
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert "X-Profile" not in resp.headers
+    assert list(tmp_path.iterdir()) == []
+    assert not profiler.running
+
+
+async def test_window(tmp_path):
+    profiler = SamplingProfiler(directory=tmp_path, interval=0.001)
+
+    path = profiler.start_window(0.05)
+    busy(0.03)
+    await asyncio.sleep(0.1)
+
+    assert "test_profiler.busy" in path.read_text()
@@ -16,6 +16,12 @@ from framework.config import Settings
 def test_default_settings():
     settings = Settings()
 
+    assert settings.ADMISSION_QUEUE_SIZE == 128
+    assert settings.ADMISSION_QUEUE_TIMEOUT == 5.0
+    assert settings.ADMISSION_READ_LIMIT == 32
+    assert settings.ADMISSION_RETRY_AFTER == 1
+    assert settings.ADMISSION_WRITE_LIMIT == 8
+    assert settings.ASSIGNMENTS_PARTITIONED is False
     assert settings.DATABASE_URL is None
     assert settings.DB_DRIVER is None
     assert settings.DB_HOST is None
@@ -27,6 +33,7 @@ def test_default_settings():
     assert settings.MODE_DEBUG is False
     assert settings.PORT == 8000
     assert settings.SENTRY_DSN is None
+    assert settings.SHARED_CACHE_PATH is None
 
     nr_cpus = 2 * cpu_count() + 1
     assert settings.WEB_CONCURRENCY == nr_cpus
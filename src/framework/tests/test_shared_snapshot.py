@@ -0,0 +1,61 @@
+from uuid import uuid4
+
+import pytest
+
+from framework.shared_snapshot import SnapshotReader
+from framework.shared_snapshot import write_snapshot
+
+pytestmark = [
+    pytest.mark.unit,
+]
+
+
+def test_lookup(tmp_path):
+    path = tmp_path / "users.snapshot"
+    records = {uuid4(): f"record {i}".encode() for i in range(100)}
+    write_snapshot(path, version=7, records=records)
+
+    reader = SnapshotReader(path)
+    assert reader.refresh()
+    assert reader.version == 7
+    assert reader.count == 100
+    assert reader.age() < 60
+
+    for key, value in records.items():
+        assert reader.get(key) == value
+    assert reader.get(uuid4()) is None
+
+    assert dict(reader.items()) == records
+
+
+def test_replaced_snapshot_is_picked_up(tmp_path):
+    path = tmp_path / "users.snapshot"
+    reader = SnapshotReader(path)
+    key = uuid4()
+
+    assert not reader.refresh()
+    assert reader.get(key) is None
+
+    write_snapshot(path, version=1, records={key: b"old"})
+    assert reader.refresh()
+    assert reader.get(key) == b"old"
+
+    write_snapshot(path, version=2, records={key: b"new", uuid4(): b""})
+    assert reader.refresh()
+    assert (reader.version, reader.count) == (2, 2)
+    assert reader.get(key) == b"new"
+
+    path.unlink()
+    assert not reader.refresh()
+    assert reader.version == 0
+    assert reader.get(key) is None
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_not_a_snapshot(tmp_path):
+    path = tmp_path / "users.snapshot"
+    path.write_bytes(b"x" * 100)
+
+    with pytest.raises(ValueError):
+        SnapshotReader(path).refresh()
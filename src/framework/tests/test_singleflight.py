@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from framework.singleflight import SingleFlight
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.unit,
+]
+
+
+async def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    executions = 0
+
+    @flights.coalesce
+    async def fetch(*, key: str) -> str:
+        nonlocal executions
+        executions += 1
+        await asyncio.sleep(0.01)
+        return key.upper()
+
+    results = await asyncio.gather(
+        *(fetch(key="a") for _ in range(5)),
+        fetch(key="b"),
+    )
+
+    assert results == ["A"] * 5 + ["B"]
+    assert executions == 2
+    assert flights.stats() == {
+        "calls": 6,
+        "executions": 2,
+        "ratio": 0.6667,
+        "shared": 4,
+    }
+
+    assert await fetch(key="a") == "A"
+    assert executions == 3
+
+
+async def test_errors_are_shared():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(
+        flights.do("key", fail),
+        flights.do("key", fail),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flights.stats()["executions"] == 1
+
+
+async def test_cancelled_caller_does_not_cancel_the_flight():
+    flights = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return 42
+
+    leader = asyncio.create_task(flights.do("key", slow))
+    follower = asyncio.create_task(flights.do("key", slow))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+
+    assert await follower == 42
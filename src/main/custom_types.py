@@ -1,4 +1,8 @@
 from datetime import date
+from datetime import datetime
+from typing import Any
+from typing import Dict
+from typing import List
 from typing import Optional
 from uuid import UUID
 
@@ -32,3 +36,20 @@ class AssignmentT(OrmModel):
     project_id: UUID = Field(...)
     begins: date = Field(...)
     ends: Optional[date] = Field(default=None)
+
+
+class IdsT(BaseModel):
+    ids: List[UUID] = Field(...)
+
+
+class JobT(Entity):
+    kind: str = Field(...)
+    payload: Dict[str, Any] = Field(default_factory=dict)
+    max_attempts: Optional[int] = Field(default=None, ge=1)
+    status: Optional[str] = Field(default=None)
+    attempts: Optional[int] = Field(default=None)
+    result: Optional[Any] = Field(default=None)
+    error: Optional[str] = Field(default=None)
+    run_at: Optional[datetime] = Field(default=None)
+    created_at: Optional[datetime] = Field(default=None)
+    updated_at: Optional[datetime] = Field(default=None)
@@ -1,22 +1,56 @@
+import functools
+import re
+import time
+from collections import defaultdict
 from contextlib import asynccontextmanager
 from datetime import date
+from datetime import datetime
+from datetime import timedelta
+from typing import Any
+from typing import Dict
+from typing import Hashable
+from typing import Iterable
 from typing import List
+from typing import NamedTuple
 from typing import Optional
+from typing import Tuple
+from typing import Type
 from uuid import uuid4
 
+import asyncpg
 from delorean import Delorean
 from sqlalchemy import Boolean
 from sqlalchemy import Column
 from sqlalchemy import Date
+from sqlalchemy import DateTime
 from sqlalchemy import ForeignKey
+from sqlalchemy import Index
+from sqlalchemy import Integer
+from sqlalchemy import Interval
+from sqlalchemy import LargeBinary
+from sqlalchemy import Sequence
+from sqlalchemy import Table
 from sqlalchemy import Text
 from sqlalchemy import UniqueConstraint
 from sqlalchemy import and_
+from sqlalchemy import any_
+from sqlalchemy import bindparam
+from sqlalchemy import cast
 from sqlalchemy import create_engine
+from sqlalchemy import delete
+from sqlalchemy import func
+from sqlalchemy import literal
+from sqlalchemy import or_
 from sqlalchemy import select
 from sqlalchemy import text
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import TSTZRANGE
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -26,8 +60,11 @@ from sqlalchemy.orm import joinedload
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm import sessionmaker
 
+from framework import deadlines
 from framework.config import settings
 from framework.logging import logger
+from framework.singleflight import SingleFlight
+from framework.slow_queries import SlowQueryLog
 
 _db_url = settings.DATABASE_URL.replace("postgres", "postgresql")
 if "?" in _db_url:
@@ -35,11 +72,24 @@ if "?" in _db_url:
 
 engine = create_async_engine(
     _db_url.replace("://", "+asyncpg://"),
+    connect_args={
+        "prepared_statement_cache_size": (
+            settings.DB_PREPARED_STATEMENT_CACHE_SIZE
+        ),
+    },
     echo=settings.MODE_DEBUG_SQL,
+    query_cache_size=settings.DB_QUERY_CACHE_SIZE,
 )
 
 engine_sync = create_engine(_db_url, echo=settings.MODE_DEBUG_SQL)
 
+slow_queries = SlowQueryLog(
+    threshold=settings.SLOW_QUERY_THRESHOLD,
+    sample_rate=settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+    max_entries=settings.SLOW_QUERY_LOG_SIZE,
+)
+slow_queries.install(engine.sync_engine)
+
 Session = sessionmaker(
     engine,
     class_=AsyncSession,
@@ -48,12 +98,105 @@ Session = sessionmaker(
 )
 
 
+async def connect_raw() -> asyncpg.Connection:
+    """
+    Opens a dedicated asyncpg connection outside of the pool,
+    e.g. for LISTEN which holds the connection for a long time.
+    """
+    return await asyncpg.connect(_db_url)
+
+
+class CheckoutStats:
+    """
+    How long sessions wait for a connection of the pool.
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_max = 0.0
+        self.wait_total = 0.0
+        self.waiting = 0
+
+    @asynccontextmanager
+    async def measure(self):
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            wait = time.perf_counter() - started
+            self.waiting -= 1
+            self.checkouts += 1
+            self.wait_max = max(self.wait_max, wait)
+            self.wait_total += wait
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "checkouts": self.checkouts,
+            "wait_max": round(self.wait_max, 6),
+            "wait_mean": (
+                round(self.wait_total / self.checkouts, 6)
+                if self.checkouts
+                else None
+            ),
+            "waiting": self.waiting,
+        }
+
+
+checkouts = CheckoutStats()
+
+
+def pool_stats() -> Dict[str, Any]:
+    pool = engine.sync_engine.pool
+    return {
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "size": pool.size(),
+        **checkouts.stats(),
+    }
+
+
+# sqlstates of statements cancelled by statement_timeout / lock_timeout
+TIMEOUT_SQLSTATES = frozenset({"57014", "55P03"})
+
+_q_set_timeouts = text(
+    "select set_config('statement_timeout', :timeout, true),"
+    " set_config('lock_timeout', :timeout, true)"
+)
+
+
 @asynccontextmanager
 async def begin_session():
+    """
+    Within a request's deadline statements of the session
+    are limited by the remaining budget.
+    Statements cancelled by the limit raise DeadlineExceededError.
+    """
     async with Session() as session:
         async with session.begin():
-            yield session
+            async with checkouts.measure():
+                await session.connection()
+            budget = await limit_statements(session)
+            try:
+                yield session
+            except DBAPIError as err:
+                sqlstate = getattr(err.orig, "sqlstate", None)
+                if budget is not None and sqlstate in TIMEOUT_SQLSTATES:
+                    raise deadlines.DeadlineExceededError from err
+                raise
+
 
+async def limit_statements(session: AsyncSession) -> Optional[float]:
+    budget = deadlines.check()
+    if budget is not None:
+        timeout = max(int(budget * 1000), 1)
+        await session.execute(_q_set_timeouts, {"timeout": str(timeout)})
+
+    return budget
+
+
+reads = SingleFlight()
 
 Base = declarative_base()
 
@@ -102,6 +245,20 @@ class Project(Model):
     )
 
 
+# With the partitioned layout assignments are range-partitioned
+# by the year of `begins`, so `begins` becomes a part of every unique key
+# and a pair of project and user may have several stints.
+ASSIGNMENTS_PARTITIONED = settings.ASSIGNMENTS_PARTITIONED
+
+ASSIGNMENT_KEY = ("project_id", "user_id")
+if ASSIGNMENTS_PARTITIONED:
+    ASSIGNMENT_KEY += ("begins",)
+
+_partitioning = {}
+if ASSIGNMENTS_PARTITIONED:
+    _partitioning["postgresql_partition_by"] = "RANGE (begins)"
+
+
 class Assignment(Model):
     __tablename__ = "assignments"
 
@@ -127,6 +284,7 @@ class Assignment(Model):
         Date,
         default=lambda: Delorean().date,
         nullable=False,
+        primary_key=ASSIGNMENTS_PARTITIONED,
         server_default=text("current_date"),
     )
     ends = Column(
@@ -146,13 +304,731 @@ class Assignment(Model):
         uselist=False,
     )
 
-    __table_args__ = (UniqueConstraint("project_id", "user_id"),)
+    __table_args__ = (
+        # keyset order of the retention purge
+        Index("assignments_ends_id_idx", "ends", "id"),
+        UniqueConstraint(*ASSIGNMENT_KEY),
+        _partitioning,
+    )
+
+
+# Closed assignments are moved here by `purge_assignments`,
+# so the hot table holds only the current ones.
+assignments_archive = Table(
+    "assignments_archive",
+    Base.metadata,
+    Column(
+        "id",
+        UUID(as_uuid=True),
+        primary_key=True,
+    ),
+    Column(
+        "user_id",
+        UUID(as_uuid=True),
+        index=True,
+        nullable=False,
+    ),
+    Column(
+        "project_id",
+        UUID(as_uuid=True),
+        index=True,
+        nullable=False,
+    ),
+    Column(
+        "begins",
+        Date,
+        nullable=False,
+        primary_key=ASSIGNMENTS_PARTITIONED,
+    ),
+    Column(
+        "ends",
+        Date,
+        nullable=True,
+    ),
+    Column(
+        "archived_at",
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    ),
+    **_partitioning,
+)
+
+
+class AssignmentHistory(Model):
+    """
+    Versions of assignments: each is valid during its range of system time,
+    the current one is open-ended.
+    """
+
+    __tablename__ = "assignment_history"
+
+    assignment_id = Column(
+        UUID(as_uuid=True),
+        index=True,
+        nullable=False,
+    )
+    user_id = Column(
+        UUID(as_uuid=True),
+        nullable=False,
+    )
+    project_id = Column(
+        UUID(as_uuid=True),
+        nullable=False,
+    )
+    begins = Column(
+        Date,
+        nullable=False,
+    )
+    ends = Column(
+        Date,
+        nullable=True,
+    )
+    valid = Column(
+        TSTZRANGE,
+        nullable=False,
+    )
+
+    __table_args__ = (
+        Index(
+            "assignment_history_valid_idx",
+            "valid",
+            postgresql_using="gist",
+        ),
+    )
+
+
+class IdempotencyRecord(Base):
+    __tablename__ = "idempotency_keys"
+
+    key = Column(
+        Text,
+        primary_key=True,
+    )
+    fingerprint = Column(
+        Text,
+        nullable=False,
+    )
+    status = Column(
+        Integer,
+        nullable=False,
+    )
+    headers = Column(
+        JSONB,
+        nullable=False,
+    )
+    body = Column(
+        LargeBinary,
+        nullable=False,
+    )
+    expires_at = Column(
+        DateTime(timezone=True),
+        index=True,
+        nullable=False,
+    )
+
+
+class Job(Model):
+    __tablename__ = "jobs"
+
+    kind = Column(
+        Text,
+        nullable=False,
+    )
+    payload = Column(
+        JSONB,
+        nullable=False,
+        server_default=text("'{}'::jsonb"),
+    )
+    status = Column(
+        Text,
+        nullable=False,
+        server_default=text("'queued'"),
+    )
+    attempts = Column(
+        Integer,
+        nullable=False,
+        server_default=text("0"),
+    )
+    max_attempts = Column(
+        Integer,
+        nullable=False,
+    )
+    run_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
+    locked_until = Column(
+        DateTime(timezone=True),
+        nullable=True,
+    )
+    result = Column(
+        JSONB,
+        nullable=True,
+    )
+    error = Column(
+        Text,
+        nullable=True,
+    )
+    created_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
+    updated_at = Column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
+
+    __table_args__ = (Index("jobs_status_run_at_idx", "status", "run_at"),)
+
+
+CHANGES_CHANNEL = "galera_changes"
+
+changes_seq = Sequence("change_events_seq", metadata=Base.metadata)
+
+# xid is the 64-bit id of the writing transaction:
+# readers of a snapshot tell by it whether the change is in the snapshot
+_q_publish_change = text(
+    """
+    with change as (
+        select
+            nextval('change_events_seq') as id,
+            pg_current_xact_id()::text::bigint as xid
+    )
+    select
+        change.xid,
+        pg_notify(
+            :channel,
+            json_build_object(
+                'id', change.id,
+                'entity', cast(:entity as text),
+                'op', cast(:op as text),
+                'key', cast(:key as text),
+                'xid', change.xid
+            )::text
+        )
+    from change
+    """
+).bindparams(bindparam("channel", value=CHANGES_CHANNEL))
+
+
+async def publish_change(
+    session: AsyncSession,
+    *,
+    entity: str,
+    op: str,
+    key: UUID,
+) -> None:
+    """
+    Queues a change event which is delivered to listeners
+    of CHANGES_CHANNEL when (and only if) the session's transaction commits.
+    """
+    result = await session.execute(
+        _q_publish_change,
+        {"entity": entity, "op": op, "key": str(key)},
+    )
+    observe_change(result.scalar_one())
+
+
+# one event per key, numbered in the order of the keys
+_q_publish_changes = text(
+    """
+    with change as (
+        select
+            nextval('change_events_seq') as id,
+            pg_current_xact_id()::text::bigint as xid,
+            changed.key
+        from unnest(cast(:keys as text[])) with ordinality
+            as changed(key, position)
+        order by changed.position
+    )
+    select
+        change.xid,
+        pg_notify(
+            :channel,
+            json_build_object(
+                'id', change.id,
+                'entity', cast(:entity as text),
+                'op', cast(:op as text),
+                'key', change.key,
+                'xid', change.xid
+            )::text
+        )
+    from change
+    order by change.id
+    """
+).bindparams(bindparam("channel", value=CHANGES_CHANNEL))
+
+
+async def publish_changes(
+    session: AsyncSession,
+    *,
+    entity: str,
+    op: str,
+    keys: Iterable[UUID],
+) -> None:
+    """
+    Queues change events of many keys with one statement,
+    same as `publish_change` does for one.
+    """
+    keys = [str(key) for key in keys]
+    if not keys:
+        return
+
+    result = await session.execute(
+        _q_publish_changes,
+        {"entity": entity, "op": op, "keys": keys},
+    )
+    observe_change(max(result.scalars()))
+
+
+# the newest writing transaction this worker knows about:
+# its own or one seen in the change feed
+last_change_xid = 0
+
+
+def observe_change(xid: int) -> None:
+    global last_change_xid
+    last_change_xid = max(last_change_xid, xid)
+
+
+ENTITY_TABLES = {
+    "assignment": "assignments",
+    "project": "projects",
+    "user": "users",
+}
+
+# bumped after every committed write this worker knows about;
+# cached exact counts of a table are valid only for its current version
+table_versions: Dict[str, int] = defaultdict(int)
+
+_exact_counts: Dict[Hashable, Tuple[int, float, int]] = {}
+
+
+def bump_table_version(table: str) -> None:
+    table_versions[table] += 1
+
+
+# As the planner does, the density of rows (reltuples / relpages)
+# is scaled by the current size: pg_class is only updated by
+# vacuum, analyze and some DDL. Partitions are summed up.
+# -1 if a non-empty table (partition) has never been measured.
+_q_estimate_table_rows = text(
+    """
+    select case
+        when bool_or(c.relpages = 0 and pg_relation_size(c.oid) > 0) then -1
+        else coalesce(sum(
+            case when c.relpages > 0 then
+                c.reltuples / c.relpages * pg_relation_size(c.oid)
+                / current_setting('block_size')::int
+            else 0 end
+        ), 0)::bigint
+    end
+    from pg_class as c
+    where c.oid in (
+        select cast(:table as regclass)
+        union
+        select relid from pg_partition_tree(cast(:table as regclass))
+    )
+    """
+)
+
+
+@reads.coalesce
+async def count_rows(
+    table: Table,
+    *,
+    exact: bool = False,
+    where=None,
+    key: Hashable = (),
+) -> int:
+    """
+    Counts rows of the table (optionally matching `where`).
+
+    The default estimate comes from pg_class for a whole table
+    and from the planner for a filtered one; a table which has never been
+    measured is counted exactly.
+    Exact counts are cached per table version (and `key` of the filter)
+    for at most EXACT_COUNT_CACHE_TTL seconds.
+    """
+    if not exact:
+        estimate = await _estimate_rows(table, where)
+        if estimate >= 0:
+            return estimate
+
+    cache_key = (table.name, key)
+    version = table_versions[table.name]
+    cached = _exact_counts.get(cache_key)
+    if cached is not None:
+        cached_version, expires_at, count = cached
+        if cached_version == version and expires_at > time.monotonic():
+            return count
+
+    q = select(func.count()).select_from(table)
+    if where is not None:
+        q = q.where(where)
+
+    async with begin_session() as session:
+        result = await session.execute(q)
+        count = result.scalar_one()
+
+    expires_at = time.monotonic() + settings.EXACT_COUNT_CACHE_TTL
+    _exact_counts[cache_key] = (version, expires_at, count)
+
+    return count
+
+
+async def _estimate_rows(table: Table, where=None) -> int:
+    """
+    Returns -1 when there is no estimate: the table is never measured.
+    """
+    async with begin_session() as session:
+        if where is None:
+            result = await session.execute(
+                _q_estimate_table_rows, {"table": table.name}
+            )
+            return result.scalar_one()
+
+        q = select(literal(1)).select_from(table).where(where)
+        compiled = q.compile(
+            dialect=engine.dialect,
+            compile_kwargs={"literal_binds": True},
+        )
+        # text() would take ":word" within string literals for parameters
+        connection = await session.connection()
+        result = await connection.exec_driver_sql(
+            f"explain (format json) {compiled}"
+        )
+        plan = result.scalar_one()
+
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+_q_has_trgm = text(
+    "select exists (select from pg_extension where extname = 'pg_trgm')"
+)
+
+# whether pg_trgm is installed: detected on the first search
+_fuzzy_search: Optional[bool] = None
+
+
+def _escape_like(value: str) -> str:
+    return re.sub(r"([\\%_])", r"\\\1", value)
+
+
+@functools.lru_cache(maxsize=None)
+def _q_search(model: Type[Model], *, fuzzy: bool):
+    """
+    Names containing the query (case-insensitive) match,
+    with pg_trgm so do names similar to it.
+    Prefix matches go first, then the most similar (or the shortest) names.
+    """
+    query = bindparam("query")
+    contains = model.name.ilike(bindparam("contains"), escape="\\")
+    starts = model.name.ilike(bindparam("starts"), escape="\\")
+
+    if fuzzy:
+        match = or_(contains, model.name.op("%")(query))
+        closeness = func.similarity(model.name, query).desc()
+    else:
+        match = contains
+        closeness = func.length(model.name)
+
+    return (
+        select(model)
+        .where(match)
+        .order_by(starts.desc(), closeness, model.name)
+        .limit(bindparam("limit"))
+    )
+
+
+def _search_values(query: str, *, limit: int, fuzzy: bool) -> Dict:
+    escaped = _escape_like(query)
+    values = {
+        "contains": f"%{escaped}%",
+        "limit": limit,
+        "starts": f"{escaped}%",
+    }
+    if fuzzy:
+        values["query"] = query
+
+    return values
+
 
+async def _search(model: Type[Model], *, query: str, limit: int) -> List:
+    global _fuzzy_search
 
-def create_tables():
-    Base.metadata.create_all(engine_sync)
+    async with begin_session() as session:
+        if _fuzzy_search is None:
+            result = await session.execute(_q_has_trgm)
+            _fuzzy_search = result.scalar_one()
+
+        result = await session.execute(
+            _q_search(model, fuzzy=_fuzzy_search),
+            _search_values(query, limit=limit, fuzzy=_fuzzy_search),
+        )
+        objs = result.scalars().all()
+
+    return objs
+
+
+def create_tables(bind=None):
+    bind = bind or engine_sync
+    Base.metadata.create_all(bind)
     logger.info("tables are created")
 
+    create_search_indexes(bind)
+    create_history_trigger(bind)
+
+    if ASSIGNMENTS_PARTITIONED:
+        year = Delorean().date.year
+        create_assignment_partitions(bind, years=(year, year + 1))
+
+
+# Statements of a trigger function take fresh snapshots:
+# an upsert which has waited for a concurrent one of the same key
+# sees (and closes) the version appended by it.
+# The range is never inverted by a transaction which has started earlier.
+_q_create_history_trigger = text(
+    """
+    create or replace function assignment_history_write()
+    returns trigger language plpgsql as $$
+    declare
+        at timestamptz := now();
+    begin
+        if current_setting('galera.skip_history', true) = 'on' then
+            return null;
+        end if;
+
+        update assignment_history
+        set valid = tstzrange(lower(valid), greatest(lower(valid), at))
+        where assignment_id = new.id and upper_inf(valid)
+        returning upper(valid) into at;
+
+        insert into assignment_history
+            (assignment_id, user_id, project_id, begins, ends, valid)
+        values (
+            new.id, new.user_id, new.project_id, new.begins, new.ends,
+            tstzrange(coalesce(at, now()), null)
+        );
+
+        return null;
+    end
+    $$;
+
+    drop trigger if exists assignments_history on assignments;
+
+    create trigger assignments_history
+    after insert or update on assignments
+    for each row execute function assignment_history_write();
+    """
+)
+
+
+def create_history_trigger(bind=None):
+    """
+    Every written version of an assignment is kept in its history.
+    """
+    with (bind or engine_sync).begin() as connection:
+        connection.execute(_q_create_history_trigger)
+
+
+SEARCHABLE_TABLES = ("projects", "users")
+
+
+def create_search_indexes(bind=None):
+    """
+    Creates trigram GIN indexes on names when pg_trgm is available.
+    Without it the name search still works, but scans the table.
+    """
+    bind = bind or engine_sync
+
+    try:
+        with bind.begin() as connection:
+            connection.execute(text("create extension if not exists pg_trgm"))
+    except DBAPIError as err:
+        logger.warning(
+            f"pg_trgm is not available, names are not indexed: {err}"
+        )
+        return
+
+    with bind.begin() as connection:
+        for table in SEARCHABLE_TABLES:
+            connection.execute(
+                text(
+                    f"create index if not exists {table}_name_trgm_idx"
+                    f" on {table} using gin (name gin_trgm_ops)"
+                )
+            )
+
+    logger.info("search indexes are created")
+
+
+PARTITIONED_TABLES = (
+    Assignment.__tablename__,
+    assignments_archive.name,
+)
+
+
+def create_assignment_partitions(bind=None, *, years: Iterable[int]):
+    """
+    Creates the default partitions and yearly ones for the given years.
+
+    Rows of a new year which have already landed in the default partition
+    are moved into the new partition.
+    Returns names of the created partitions.
+    """
+    created = []
+
+    with (bind or engine_sync).begin() as connection:
+        # moved rows are not new versions of assignments
+        connection.execute(text("set local galera.skip_history = 'on'"))
+
+        for table in PARTITIONED_TABLES:
+            default = f"{table}_default"
+            connection.execute(
+                text(
+                    f"create table if not exists {default}"
+                    f" partition of {table} default"
+                )
+            )
+
+            for year in sorted(set(years)):
+                partition = f"{table}_y{year:04d}"
+                exists = connection.execute(
+                    text("select to_regclass(:name) is not null"),
+                    {"name": partition},
+                ).scalar_one()
+                if exists:
+                    continue
+
+                lower, upper = f"{year:04d}-01-01", f"{year + 1:04d}-01-01"
+                moved = f"begins >= '{lower}' and begins < '{upper}'"
+                connection.execute(
+                    text(
+                        f"""
+                        alter table {table} detach partition {default};
+                        create table {partition} partition of {table}
+                            for values from ('{lower}') to ('{upper}');
+                        insert into {table}
+                            select * from {default} where {moved};
+                        delete from {default} where {moved};
+                        alter table {table} attach partition {default} default;
+                        """
+                    )
+                )
+                created.append(partition)
+
+    if created:
+        logger.info(f"partitions are created: {', '.join(created)}")
+
+    return created
+
+
+class PurgeResult(NamedTuple):
+    rows: int
+    batches: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+_purge_assignments = """
+    with batch as (
+        select id, begins, ends
+        from assignments
+        where ends < :before and (ends, id) > (:after_ends, :after_id)
+        order by ends, id
+        limit :batch_size
+        for update skip locked
+    ),
+    purged as (
+        delete from assignments as a
+        using batch as b
+        where a.id = b.id and a.begins = b.begins
+        returning a.id, a.user_id, a.project_id, a.begins, a.ends
+    ){archived}
+    select count(*) over (), ends, id
+    from purged
+    order by ends desc, id desc
+    limit 1
+"""
+
+_archive_purged = """,
+    archived as (
+        insert into assignments_archive (id, user_id, project_id, begins, ends)
+        select id, user_id, project_id, begins, ends from purged
+    )"""
+
+# keyed by whether purged rows are archived
+_q_purge_assignments = {
+    False: text(_purge_assignments.format(archived="")),
+    True: text(_purge_assignments.format(archived=_archive_purged)),
+}
+
+
+def purge_assignments(
+    bind=None,
+    *,
+    before: date,
+    archive: bool,
+    batch_size: int,
+    pause: float,
+) -> PurgeResult:
+    """
+    Deletes (or moves to the archive) assignments which have ended
+    before the date.
+
+    Rows go in small batches in the (ends, id) order, each in its own
+    short transaction followed by a pause, so locks are held briefly
+    and replicas keep up. Rows locked by others are skipped until next run.
+    """
+    bind = bind or engine_sync
+    values = {
+        "after_ends": date.min,
+        "after_id": "00000000-0000-0000-0000-000000000000",
+        "batch_size": batch_size,
+        "before": before,
+    }
+    rows = batches = 0
+    started = time.perf_counter()
+
+    while True:
+        with bind.begin() as connection:
+            last = connection.execute(
+                _q_purge_assignments[archive], values
+            ).one_or_none()
+
+        if last is None:
+            break
+
+        purged, values["after_ends"], values["after_id"] = last
+        rows += purged
+        batches += 1
+        logger.debug(f"assignments batch is purged: {purged}")
+
+        if purged < batch_size:
+            break
+        time.sleep(pause)
+
+    result = PurgeResult(
+        rows=rows,
+        batches=batches,
+        seconds=time.perf_counter() - started,
+    )
+    logger.info(
+        f"assignments are purged: {result.rows}"
+        f" in {result.batches} batches,"
+        f" {result.rows_per_second:.1f} rows/s"
+    )
+
+    return result
+
 
 class DbError(RuntimeError):
     pass
@@ -176,6 +1052,14 @@ async def create_user(
                 password=password,
             )
             session.add(user)
+            await session.flush()
+            await publish_change(
+                session,
+                entity="user",
+                op="create",
+                key=user.id,
+            )
+        bump_table_version(User.__tablename__)
         return user
     except IntegrityError as err:
         raise UserAlreadyExistsError from err
@@ -185,6 +1069,20 @@ class UserNotFoundError(DbError):
     pass
 
 
+# Hot statements are built once with bound parameters:
+# each call then skips the construction and reuses the compiled form
+# from the engine's compiled cache and asyncpg's prepared statements.
+
+_q_get_user_by_id = (
+    select(User).where(User.id == bindparam("user_id")).limit(1)
+)
+
+_q_get_user_by_name = (
+    select(User).where(User.name == bindparam("name")).limit(1)
+)
+
+
+@reads.coalesce
 async def get_user(
     *,
     user_id: Optional[UUID] = None,
@@ -194,25 +1092,40 @@ async def get_user(
         raise UserNotFoundError
 
     if name:
-        c = and_(User.name == name)
+        q, params = _q_get_user_by_name, {"name": name}
     else:
-        c = and_(User.id == user_id)
+        q, params = _q_get_user_by_id, {"user_id": user_id}
 
-    q = select(User).where(c).limit(1)
     try:
         async with begin_session() as session:
-            result = await session.execute(q)
+            result = await session.execute(q, params)
             obj = result.scalars().one()
         return obj
     except NoResultFound as err:
         raise UserNotFoundError from err
 
 
+@reads.coalesce
 async def list_users() -> List[User]:
     q = select(User)
     async with begin_session() as session:
         result = await session.execute(q)
-        objs = result.scalars()
+        objs = result.scalars().all()
+    return objs
+
+
+@reads.coalesce
+async def search_users(*, query: str, limit: int) -> List[User]:
+    return await _search(User, query=query, limit=limit)
+
+
+@reads.coalesce
+async def get_users(*, user_ids: Tuple[UUID, ...]) -> List[User]:
+    ids = bindparam("ids", type_=ARRAY(UUID(as_uuid=True)))
+    q = select(User).where(User.id == any_(ids))
+    async with begin_session() as session:
+        result = await session.execute(q, {"ids": list(user_ids)})
+        objs = result.scalars().all()
     return objs
 
 
@@ -228,6 +1141,14 @@ async def create_project(
         async with begin_session() as session:
             project = Project(name=name)
             session.add(project)
+            await session.flush()
+            await publish_change(
+                session,
+                entity="project",
+                op="create",
+                key=project.id,
+            )
+        bump_table_version(Project.__tablename__)
         return project
     except IntegrityError as err:
         raise ProjectAlreadyExistsError from err
@@ -237,42 +1158,150 @@ class ProjectNotFoundError(DbError):
     pass
 
 
+_q_get_project = (
+    select(Project).where(Project.id == bindparam("project_id")).limit(1)
+)
+
+
+@reads.coalesce
 async def get_project(
     *,
     project_id: UUID,
 ) -> Project:
-    q = select(Project).where(Project.id == project_id).limit(1)
     try:
         async with begin_session() as session:
-            result = await session.execute(q)
+            result = await session.execute(
+                _q_get_project, {"project_id": project_id}
+            )
             obj = result.scalars().one()
         return obj
     except NoResultFound as err:
         raise ProjectNotFoundError from err
 
 
+@reads.coalesce
 async def list_projects() -> List[Project]:
     q = select(Project)
     async with begin_session() as session:
         result = await session.execute(q)
-        objs = result.scalars()
+        objs = result.scalars().all()
     return objs
 
 
-async def list_assignments():
-    q = select(Assignment).options(
-        joinedload(Assignment.project),
-        joinedload(Assignment.user),
-    )
+@reads.coalesce
+async def search_projects(*, query: str, limit: int) -> List[Project]:
+    return await _search(Project, query=query, limit=limit)
+
+
+@reads.coalesce
+async def get_projects(*, project_ids: Tuple[UUID, ...]) -> List[Project]:
+    ids = bindparam("ids", type_=ARRAY(UUID(as_uuid=True)))
+    q = select(Project).where(Project.id == any_(ids))
+    async with begin_session() as session:
+        result = await session.execute(q, {"ids": list(project_ids)})
+        objs = result.scalars().all()
+    return objs
+
+
+ASSIGNMENT_FIELDS = ("user_id", "project_id", "begins", "ends")
+ASSIGNMENT_EXPANSIONS = ("user", "project")
+
+
+@reads.coalesce
+async def list_assignments(
+    *,
+    fields: Tuple[str, ...] = ASSIGNMENT_FIELDS,
+    expand: Tuple[str, ...] = ASSIGNMENT_EXPANSIONS,
+    as_of: Optional[datetime] = None,
+) -> List[Row]:
+    """
+    Selects only the requested assignment columns.
+    Related users/projects are joined only when they are to be expanded
+    and are available in rows as `User` and `Project`.
+
+    Only the hot table is read: archived assignments are never scanned.
+    With `as_of` assignments are read from their history
+    as they were at that moment.
+    """
+    model = Assignment if as_of is None else AssignmentHistory
+
+    q = select(*(getattr(model, field) for field in fields))
+    q = q.select_from(model)
+
+    if as_of is not None:
+        q = q.where(assignment_history_at(as_of))
+
+    if "user" in expand:
+        q = q.add_columns(User).join(User, model.user_id == User.id)
+
+    if "project" in expand:
+        q = q.add_columns(Project).join(
+            Project, model.project_id == Project.id
+        )
+
     async with begin_session() as session:
         result = await session.execute(q)
-    return result.scalars()
+        rows = result.all()
+    return rows
+
+
+def assignment_history_at(as_of: datetime):
+    """
+    Matches the assignment versions valid at the moment (GiST-indexed).
+    The moment is rendered as a literal, so the clause can be explained.
+    """
+    moment = cast(cast(as_of.isoformat(), Text), DateTime(timezone=True))
+    return AssignmentHistory.valid.contains(moment)
 
 
 class BadAssignmentError(DbError):
     pass
 
 
+# the history is written by the assignments_history trigger;
+# every column of the key is returned
+_upsert_assignments = f"""
+    insert into assignments (project_id, user_id, begins, ends)
+    {{source}}
+    on conflict ({", ".join(ASSIGNMENT_KEY)}) do update
+    set begins = excluded.begins, ends = excluded.ends
+    returning id, project_id, user_id, begins, ends
+"""
+
+_q_upsert_assignment = text(
+    _upsert_assignments.format(
+        source="values (:project_id, :user_id, :begins, :ends)"
+    )
+)
+
+# the rows must have distinct keys: a statement cannot update a row twice
+_q_upsert_assignments = text(
+    _upsert_assignments.format(
+        source="""
+        select * from unnest(
+            cast(:project_ids as uuid[]),
+            cast(:user_ids as uuid[]),
+            cast(:begins as date[]),
+            cast(:ends as date[])
+        )"""
+    )
+).bindparams(
+    bindparam("project_ids", type_=ARRAY(UUID(as_uuid=True))),
+    bindparam("user_ids", type_=ARRAY(UUID(as_uuid=True))),
+    bindparam("begins", type_=ARRAY(Date)),
+    bindparam("ends", type_=ARRAY(Date)),
+)
+
+_q_get_assignment = (
+    select(Assignment)
+    .where(Assignment.id == bindparam("assignment_id"))
+    .options(
+        joinedload(Assignment.project),
+        joinedload(Assignment.user),
+    )
+)
+
+
 async def upsert_assignment(
     *,
     project_id: UUID,
@@ -281,52 +1310,335 @@ async def upsert_assignment(
     ends: Optional[date] = None,
 ):
     values = {
-        Assignment.project_id: project_id,
-        Assignment.user_id: user_id,
-        Assignment.begins: begins,
-        Assignment.ends: ends,
+        "project_id": project_id,
+        "user_id": user_id,
+        "begins": begins,
+        "ends": ends,
     }
 
-    qi = (
-        insert(Assignment)
-        .values(values)
-        .on_conflict_do_update(
-            index_elements=[
-                Assignment.project_id,
-                Assignment.user_id,
-            ],
-            set_={
-                Assignment.begins: begins,
-                Assignment.ends: ends,
-            },
-        )
-        .returning(
-            Assignment.id,
-        )
-    )
-
-    qsf = lambda _id: (
-        select(Assignment)
-        .where(Assignment.id == _id)
-        .options(
-            joinedload(Assignment.project),
-            joinedload(Assignment.user),
-        )
-    )
-
     try:
         async with begin_session() as session:
-            result = await session.execute(qi)
+            result = await session.execute(_q_upsert_assignment, values)
             assignment_id = result.scalar_one()
+            await publish_change(
+                session,
+                entity="assignment",
+                op="upsert",
+                key=assignment_id,
+            )
 
-            qs = qsf(assignment_id)
-            result = await session.execute(qs)
+            result = await session.execute(
+                _q_get_assignment, {"assignment_id": assignment_id}
+            )
             assignment = result.scalars().one()
     except IntegrityError as err:
         raise BadAssignmentError("invalid project_id or user_id") from err
 
+    bump_table_version(Assignment.__tablename__)
+    bump_table_version(AssignmentHistory.__tablename__)
     return assignment
 
 
+_q_get_assignments = (
+    select(Assignment)
+    .where(
+        Assignment.id
+        == any_(bindparam("ids", type_=ARRAY(UUID(as_uuid=True))))
+    )
+    .options(
+        joinedload(Assignment.project),
+        joinedload(Assignment.user),
+    )
+)
+
+
+async def upsert_assignments(values: List[Dict[str, Any]]) -> List[Assignment]:
+    """
+    Upserts many assignments in one transaction,
+    as if they were upserted one by one in the given order.
+    Returns the assignments in the same order.
+
+    Upserts of the same key are applied in rounds, the later ones last:
+    each of them returns the assignment as its own upsert has left it.
+    """
+    rounds: List[Dict[Tuple, int]] = []
+    for i, value in enumerate(values):
+        key = tuple(value[column] for column in ASSIGNMENT_KEY)
+        for keys in rounds:
+            if key not in keys:
+                keys[key] = i
+                break
+        else:
+            rounds.append({key: i})
+
+    upserted: List[Any] = [None] * len(values)
+
+    try:
+        async with begin_session() as session:
+            for keys in rounds:
+                batch = [values[i] for i in keys.values()]
+                result = await session.execute(
+                    _q_upsert_assignments,
+                    {
+                        "project_ids": [
+                            value["project_id"] for value in batch
+                        ],
+                        "user_ids": [value["user_id"] for value in batch],
+                        "begins": [value["begins"] for value in batch],
+                        "ends": [value["ends"] for value in batch],
+                    },
+                )
+                for row in result:
+                    key = tuple(
+                        getattr(row, column) for column in ASSIGNMENT_KEY
+                    )
+                    upserted[keys[key]] = row
+
+            ids = list(dict.fromkeys(row.id for row in upserted))
+            await publish_changes(
+                session, entity="assignment", op="upsert", keys=ids
+            )
+
+            result = await session.execute(_q_get_assignments, {"ids": ids})
+            found = {obj.id: obj for obj in result.scalars().unique()}
+    except IntegrityError as err:
+        raise BadAssignmentError("invalid project_id or user_id") from err
+
+    bump_table_version(Assignment.__tablename__)
+    bump_table_version(AssignmentHistory.__tablename__)
+
+    # the loaded rows are as the last upsert of their key has left them
+    return [
+        Assignment(
+            id=row.id,
+            project_id=row.project_id,
+            user_id=row.user_id,
+            begins=row.begins,
+            ends=row.ends,
+            project=found[row.id].project,
+            user=found[row.id].user,
+        )
+        for row in upserted
+    ]
+
+
+async def get_idempotency_record(*, key: str) -> Optional[IdempotencyRecord]:
+    q = select(IdempotencyRecord).where(
+        IdempotencyRecord.key == key,
+        IdempotencyRecord.expires_at > func.now(),
+    )
+    async with begin_session() as session:
+        result = await session.execute(q)
+        obj = result.scalars().one_or_none()
+    return obj
+
+
+# the oldest expired records, by the index of expires_at;
+# records being purged by another writer are skipped
+_q_purge_idempotency_records = (
+    delete(IdempotencyRecord)
+    .where(
+        IdempotencyRecord.key.in_(
+            select(IdempotencyRecord.key)
+            .where(IdempotencyRecord.expires_at <= func.now())
+            .order_by(IdempotencyRecord.expires_at)
+            .limit(bindparam("limit"))
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+    )
+    .execution_options(synchronize_session=False)
+)
+
+
+async def save_idempotency_record(
+    *,
+    key: str,
+    fingerprint: str,
+    status: int,
+    headers: List[List[str]],
+    body: bytes,
+    ttl: float,
+    purge: int = 0,
+) -> None:
+    """
+    Keeps the first stored response for a key until it expires.
+    Deletes up to `purge` expired records of any keys,
+    so keys which are never reused do not pile up.
+    """
+    qi = insert(IdempotencyRecord).values(
+        key=key,
+        fingerprint=fingerprint,
+        status=status,
+        headers=headers,
+        body=body,
+        expires_at=func.now() + timedelta(seconds=ttl),
+    )
+    qi = qi.on_conflict_do_update(
+        index_elements=[IdempotencyRecord.key],
+        set_={
+            IdempotencyRecord.fingerprint: qi.excluded.fingerprint,
+            IdempotencyRecord.status: qi.excluded.status,
+            IdempotencyRecord.headers: qi.excluded.headers,
+            IdempotencyRecord.body: qi.excluded.body,
+            IdempotencyRecord.expires_at: qi.excluded.expires_at,
+        },
+        where=IdempotencyRecord.expires_at <= func.now(),
+    )
+    async with begin_session() as session:
+        if purge > 0:
+            await session.execute(
+                _q_purge_idempotency_records, {"limit": purge}
+            )
+        await session.execute(qi)
+
+
+class JobNotFoundError(DbError):
+    pass
+
+
+async def enqueue_job(*, kind: str, payload: Dict, max_attempts: int) -> Job:
+    async with begin_session() as session:
+        job = Job(kind=kind, payload=payload, max_attempts=max_attempts)
+        session.add(job)
+        await session.flush()
+    return job
+
+
+async def get_job(*, job_id: UUID) -> Job:
+    async with begin_session() as session:
+        job = await session.get(Job, job_id)
+    if job is None:
+        raise JobNotFoundError(f"job {job_id} does not exist")
+    return job
+
+
+# Jobs whose lease has expired at their last attempt have most likely
+# killed their workers (OOM, crash): they are failed, not run once more.
+_q_fail_abandoned_jobs = (
+    update(Job)
+    .where(
+        Job.status == "running",
+        Job.locked_until < func.now(),
+        Job.attempts >= Job.max_attempts,
+    )
+    .values(
+        error="the lease has expired at the last attempt",
+        locked_until=None,
+        status="failed",
+        updated_at=func.now(),
+    )
+    .execution_options(synchronize_session=False)
+)
+
+# Due jobs and running ones whose lease has expired (their worker is gone)
+# are claimed. Rows locked by other workers' claims are skipped.
+_q_claim_jobs = (
+    update(Job)
+    .where(
+        Job.id.in_(
+            select(Job.id)
+            .where(
+                or_(
+                    and_(Job.status == "queued", Job.run_at <= func.now()),
+                    and_(
+                        Job.status == "running",
+                        Job.locked_until < func.now(),
+                        Job.attempts < Job.max_attempts,
+                    ),
+                )
+            )
+            .order_by(Job.run_at)
+            .limit(bindparam("limit"))
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+    )
+    .values(
+        attempts=Job.attempts + 1,
+        locked_until=func.now() + bindparam("lease", type_=Interval),
+        status="running",
+        updated_at=func.now(),
+    )
+    .returning(*Job.__table__.columns)
+)
+
+
+async def claim_jobs(*, limit: int, lease: float) -> List[Job]:
+    q = select(Job).from_statement(_q_claim_jobs)
+    async with begin_session() as session:
+        await session.execute(_q_fail_abandoned_jobs)
+        result = await session.execute(
+            q, {"lease": timedelta(seconds=lease), "limit": limit}
+        )
+        jobs = result.scalars().all()
+    return jobs
+
+
+async def extend_job_lease(*, job: Job, lease: float) -> bool:
+    """
+    Returns False if the attempt has lost its lease to another worker.
+    """
+    q = (
+        update(Job)
+        .where(
+            Job.id == job.id,
+            Job.attempts == job.attempts,
+            Job.status == "running",
+        )
+        .values(
+            locked_until=func.now() + timedelta(seconds=lease),
+            updated_at=func.now(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    async with begin_session() as session:
+        updated = await session.execute(q)
+    return updated.rowcount == 1
+
+
+async def finish_job(
+    *,
+    job: Job,
+    result: Any = None,
+    error: Optional[str] = None,
+    retry_in: Optional[float] = None,
+) -> bool:
+    """
+    Records the outcome of the job's current attempt:
+    success without an error, a retry if `retry_in` is given,
+    a failure otherwise.
+
+    Returns False if the attempt has lost its lease to another worker.
+    """
+    values = {
+        "error": error,
+        "locked_until": None,
+        "result": result,
+        "updated_at": func.now(),
+    }
+    if error is None:
+        values["status"] = "succeeded"
+    elif retry_in is not None:
+        values["status"] = "queued"
+        values["run_at"] = func.now() + timedelta(seconds=retry_in)
+    else:
+        values["status"] = "failed"
+
+    q = (
+        update(Job)
+        .where(
+            Job.id == job.id,
+            Job.attempts == job.attempts,
+            Job.status == "running",
+        )
+        .values(values)
+        .execution_options(synchronize_session=False)
+    )
+    async with begin_session() as session:
+        updated = await session.execute(q)
+    return updated.rowcount == 1
+
+
 if __name__ == "__main__":
     create_tables()
@@ -0,0 +1,190 @@
+import asyncio
+import itertools
+import json
+from collections import deque
+from typing import Any
+from typing import Deque
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+
+import asyncpg
+
+from framework.config import settings
+from framework.logging import logger
+from main import db
+
+Event = Dict[str, Any]
+
+RESET = "reset"
+
+
+class SubscriptionClosedError(RuntimeError):
+    pass
+
+
+class Subscription:
+    def __init__(self, feed: "ChangeFeed", *, queue_size: int):
+        self.__feed = feed
+        self.__queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+
+    def push(self, event: Event) -> None:
+        if self.closed:
+            return
+
+        try:
+            self.__queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # the client is too slow: it will reconnect with Last-Event-ID
+            # and catch up from the backlog instead of stalling the feed
+            logger.warning("change feed subscriber overflow, closing")
+            self.close()
+
+    async def get(self, timeout: float) -> Optional[Event]:
+        """
+        Returns the next event or None if nothing happened within timeout.
+        """
+        if self.closed and self.__queue.empty():
+            raise SubscriptionClosedError
+
+        try:
+            event = await asyncio.wait_for(self.__queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+        if event is None:
+            raise SubscriptionClosedError
+
+        return event
+
+    def close(self) -> None:
+        if self.closed:
+            return
+
+        self.closed = True
+        self.__feed.unsubscribe(self)
+
+        try:
+            self.__queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+
+class ChangeFeed:
+    """
+    Fans change events out of one LISTEN connection per worker.
+
+    The last `backlog_size` events are kept,
+    so a subscriber may resume from the id of the last event it has seen.
+    """
+
+    def __init__(self, *, backlog_size: int, queue_size: int):
+        self.backlog: Deque[Event] = deque(maxlen=backlog_size)
+        self.queue_size = queue_size
+
+        self.__connection: Optional[asyncpg.Connection] = None
+        self.__lock: Optional[asyncio.Lock] = None
+        self.__subscribers: Set[Subscription] = set()
+
+    @property
+    def _lock(self) -> asyncio.Lock:
+        if self.__lock is None:
+            self.__lock = asyncio.Lock()
+        return self.__lock
+
+    @property
+    def running(self) -> bool:
+        return (
+            self.__connection is not None and not self.__connection.is_closed()
+        )
+
+    async def start(self) -> None:
+        async with self._lock:
+            if self.running:
+                return
+
+            connection = await db.connect_raw()
+            connection.add_termination_listener(self._on_termination)
+            await connection.add_listener(db.CHANGES_CHANNEL, self._on_notify)
+            self.__connection = connection
+            logger.info("change feed is listening")
+
+    async def stop(self) -> None:
+        async with self._lock:
+            connection, self.__connection = self.__connection, None
+            if connection is not None and not connection.is_closed():
+                connection.remove_termination_listener(self._on_termination)
+                await connection.close()
+
+        for subscription in list(self.__subscribers):
+            subscription.close()
+
+    async def subscribe(
+        self,
+        last_event_id: Optional[int] = None,
+    ) -> Subscription:
+        await self.start()
+
+        subscription = Subscription(self, queue_size=self.queue_size)
+        for event in self.replay(last_event_id):
+            subscription.push(event)
+        self.__subscribers.add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.__subscribers.discard(subscription)
+
+    def replay(self, last_event_id: Optional[int]) -> List[Event]:
+        """
+        Returns the events which have arrived after the given one.
+
+        Ids are taken when the events are published,
+        but the events arrive in the order of their commits:
+        an event with a lower id may arrive later.
+        All listeners get the events in the same order.
+        """
+        if last_event_id is None:
+            return []
+
+        for i, event in enumerate(self.backlog):
+            if event["id"] == last_event_id:
+                return list(itertools.islice(self.backlog, i + 1, None))
+
+        # events may have been missed: the client has to re-read lists
+        return [{"id": last_event_id, "entity": RESET}]
+
+    def _on_notify(self, _connection, _pid, _channel, payload: str) -> None:
+        event = json.loads(payload)
+        self.backlog.append(event)
+        db.observe_change(event.get("xid", 0))
+
+        table = db.ENTITY_TABLES.get(event["entity"])
+        if table:
+            db.bump_table_version(table)
+
+        for subscription in list(self.__subscribers):
+            subscription.push(event)
+
+    def _on_termination(self, _connection) -> None:
+        logger.warning("change feed connection is lost")
+        self.__connection = None
+
+        for subscription in list(self.__subscribers):
+            subscription.close()
+
+
+feed = ChangeFeed(
+    backlog_size=settings.EVENTS_BACKLOG_SIZE,
+    queue_size=settings.EVENTS_SUBSCRIBER_QUEUE_SIZE,
+)
+
+
+def format_sse(event: Event) -> str:
+    return (
+        f"id: {event['id']}\n"
+        f"event: {event['entity']}\n"
+        f"data: {json.dumps(event)}\n\n"
+    )
@@ -0,0 +1,62 @@
+from typing import Optional
+
+from framework.config import settings
+from framework.idempotency import IdempotencyStore
+from framework.idempotency import MemoryIdempotencyStore
+from framework.idempotency import StoredResponse
+from main import db
+
+
+class DbIdempotencyStore(IdempotencyStore):
+    """
+    Shares stored responses between workers via the idempotency_keys table.
+    Every put deletes up to `purge_batch_size` expired responses.
+    """
+
+    def __init__(self, *, ttl: float, purge_batch_size: int = 100):
+        self.purge_batch_size = purge_batch_size
+        self.ttl = ttl
+
+    async def get(self, key: str) -> Optional[StoredResponse]:
+        obj = await db.get_idempotency_record(key=key)
+        if obj is None:
+            return None
+
+        return StoredResponse(
+            fingerprint=obj.fingerprint,
+            status=obj.status,
+            headers=[
+                (name.encode("latin-1"), value.encode("latin-1"))
+                for name, value in obj.headers
+            ],
+            body=obj.body,
+        )
+
+    async def put(self, key: str, response: StoredResponse) -> None:
+        await db.save_idempotency_record(
+            key=key,
+            fingerprint=response.fingerprint,
+            status=response.status,
+            headers=[
+                [name.decode("latin-1"), value.decode("latin-1")]
+                for name, value in response.headers
+            ],
+            body=response.body,
+            ttl=self.ttl,
+            purge=self.purge_batch_size,
+        )
+
+
+def build_store() -> IdempotencyStore:
+    backend = None
+    if settings.IDEMPOTENCY_DB_STORE:
+        backend = DbIdempotencyStore(
+            ttl=settings.IDEMPOTENCY_TTL,
+            purge_batch_size=settings.IDEMPOTENCY_PURGE_BATCH_SIZE,
+        )
+
+    return MemoryIdempotencyStore(
+        max_entries=settings.IDEMPOTENCY_CACHE_SIZE,
+        ttl=settings.IDEMPOTENCY_TTL,
+        backend=backend,
+    )
@@ -0,0 +1,240 @@
+import asyncio
+import functools
+from datetime import timedelta
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import Optional
+from typing import Set
+
+from delorean import Delorean
+from fastapi.encoders import jsonable_encoder
+
+from framework import deadlines
+from framework.config import settings
+from framework.logging import logger
+from main import db
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+HANDLERS: Dict[str, Handler] = {}
+
+
+def job(kind: str):
+    """
+    Registers the coroutine function as the handler of jobs of the kind.
+    It gets the job's payload and returns a JSON-serializable result.
+    """
+
+    def register(fn: Handler) -> Handler:
+        HANDLERS[kind] = fn
+        return fn
+
+    return register
+
+
+class LeaseLostError(RuntimeError):
+    pass
+
+
+class JobRunner:
+    """
+    Runs queued jobs of the jobs table, at most `concurrency` at a time.
+
+    Every worker runs its own runner: a job is claimed by one of them
+    for `lease` seconds. The lease is extended while the job runs:
+    once it expires the job is considered abandoned
+    and may be claimed again, unless that was its last attempt.
+    Failed jobs are retried with an exponential backoff.
+    """
+
+    def __init__(
+        self,
+        *,
+        concurrency: int,
+        poll_interval: float,
+        lease: float,
+        backoff: float,
+    ):
+        self.backoff = backoff
+        self.concurrency = concurrency
+        self.lease = lease
+        self.poll_interval = poll_interval
+
+        self.__active: Set[asyncio.Task] = set()
+        self.__poller: Optional[asyncio.Task] = None
+        self.__wakeup: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return self.__poller is not None and not self.__poller.done()
+
+    async def start(self) -> None:
+        if self.running or self.concurrency <= 0:
+            return
+
+        self.__wakeup = asyncio.Event()
+        self.__poller = asyncio.create_task(self._poll())
+        logger.info("job runner is started")
+
+    async def stop(self) -> None:
+        """
+        Cancels the running jobs: they are picked up again
+        once their lease expires.
+        """
+        poller, self.__poller = self.__poller, None
+        tasks = list(self.__active)
+        if poller is not None:
+            tasks.append(poller)
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def wake(self) -> None:
+        if self.__wakeup is not None:
+            self.__wakeup.set()
+
+    async def _poll(self) -> None:
+        # the runner may be started by a request: jobs are not bound to it
+        deadlines.clear()
+
+        while True:
+            self.__wakeup.clear()
+
+            free = self.concurrency - len(self.__active)
+            if free > 0:
+                try:
+                    claimed = await db.claim_jobs(limit=free, lease=self.lease)
+                except Exception:
+                    logger.exception("jobs are not claimed")
+                    claimed = []
+
+                for claimed_job in claimed:
+                    task = asyncio.create_task(self._run(claimed_job))
+                    self.__active.add(task)
+                    task.add_done_callback(self._on_done)
+
+            try:
+                await asyncio.wait_for(
+                    self.__wakeup.wait(), self.poll_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    def _on_done(self, task: asyncio.Task) -> None:
+        self.__active.discard(task)
+
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"job outcome is not recorded: {task.exception()}")
+
+        # a slot is free
+        self.wake()
+
+    async def _run(self, claimed_job: db.Job) -> None:
+        handler = HANDLERS.get(claimed_job.kind)
+
+        try:
+            if handler is None:
+                raise LookupError(f"unknown job kind: {claimed_job.kind}")
+            result = jsonable_encoder(
+                await self._execute(claimed_job, handler)
+            )
+        except LeaseLostError:
+            # the outcome is left to the worker which has taken the job over
+            logger.warning(
+                f"job {claimed_job.id} ({claimed_job.kind})"
+                f" attempt {claimed_job.attempts} has lost its lease"
+            )
+        except Exception as err:
+            retry_in = None
+            if handler is not None and (
+                claimed_job.attempts < claimed_job.max_attempts
+            ):
+                retry_in = self.backoff * 2 ** (claimed_job.attempts - 1)
+
+            logger.warning(
+                f"job {claimed_job.id} ({claimed_job.kind})"
+                f" attempt {claimed_job.attempts} has failed: {err!r}"
+            )
+            await db.finish_job(
+                job=claimed_job, error=repr(err), retry_in=retry_in
+            )
+        else:
+            await db.finish_job(job=claimed_job, result=result)
+
+    async def _execute(self, claimed_job: db.Job, handler: Handler) -> Any:
+        """
+        Runs the handler while its lease is kept.
+        The handler is cancelled if the lease is lost.
+        """
+        work = asyncio.ensure_future(handler(claimed_job.payload))
+        heartbeat = asyncio.create_task(self._keep_lease(claimed_job))
+
+        try:
+            await asyncio.wait(
+                {work, heartbeat}, return_when=asyncio.FIRST_COMPLETED
+            )
+        except asyncio.CancelledError:
+            work.cancel()
+            raise
+        finally:
+            heartbeat.cancel()
+
+        if not work.done():
+            work.cancel()
+            await asyncio.gather(work, return_exceptions=True)
+            raise LeaseLostError
+
+        return work.result()
+
+    async def _keep_lease(self, claimed_job: db.Job) -> None:
+        """
+        Extends the lease while the attempt runs.
+        Returns once another worker has taken the job over.
+        """
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                extended = await db.extend_job_lease(
+                    job=claimed_job, lease=self.lease
+                )
+            except Exception:
+                logger.exception(f"job {claimed_job.id} lease is not extended")
+                continue
+
+            if not extended:
+                return
+
+
+runner = JobRunner(
+    concurrency=settings.JOBS_CONCURRENCY,
+    poll_interval=settings.JOBS_POLL_INTERVAL,
+    lease=settings.JOBS_LEASE,
+    backoff=settings.JOBS_BACKOFF,
+)
+
+
+@job("retention")
+async def retention(payload: Dict[str, Any]) -> Dict[str, Any]:
+    days = payload.get("days", settings.RETENTION_DAYS)
+    mode = payload.get("mode", settings.RETENTION_MODE)
+
+    purge = functools.partial(
+        db.purge_assignments,
+        before=Delorean().date - timedelta(days=days),
+        archive=mode == "archive",
+        batch_size=settings.RETENTION_BATCH_SIZE,
+        pause=settings.RETENTION_PAUSE,
+    )
+
+    # the purge is synchronous and pauses between batches
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(None, purge)
+
+    return {
+        "batches": result.batches,
+        "rows": result.rows,
+        "rows_per_second": result.rows_per_second,
+    }
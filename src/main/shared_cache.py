@@ -0,0 +1,150 @@
+import json
+from pathlib import Path
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Type
+from uuid import UUID
+
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy import text
+
+from framework.config import settings
+from framework.shared_snapshot import SnapshotReader
+from framework.shared_snapshot import write_snapshot
+from main import db
+from main.custom_types import ProjectT
+from main.custom_types import UserT
+
+# passwords are never put into a snapshot
+COLUMNS = {
+    "projects": (db.Project.id, db.Project.name),
+    "users": (db.User.id, db.User.name, db.User.is_admin),
+}
+
+MODELS: Dict[str, Type[BaseModel]] = {
+    "projects": ProjectT,
+    "users": UserT,
+}
+
+# every transaction older than the oldest one running at the moment
+# of the snapshot has either committed into the snapshot or aborted
+_q_snapshot_version = text(
+    "select pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+)
+
+
+def snapshot_path(name: str) -> Path:
+    return Path(settings.SHARED_CACHE_PATH) / f"{name}.snapshot"
+
+
+def refresh(bind=None) -> int:
+    """
+    Writes snapshots of all entities, read in one transaction.
+    Returns their version.
+    """
+    bind = bind or db.engine_sync
+
+    with bind.connect() as connection:
+        connection = connection.execution_options(
+            isolation_level="REPEATABLE READ"
+        )
+        with connection.begin():
+            # the first statement fixes the data the transaction sees
+            version = connection.execute(_q_snapshot_version).scalar_one()
+            records = {
+                name: {
+                    row.id: json.dumps(
+                        dict(row._mapping), default=str
+                    ).encode()
+                    for row in connection.execute(select(*columns))
+                }
+                for name, columns in COLUMNS.items()
+            }
+
+    Path(settings.SHARED_CACHE_PATH).mkdir(parents=True, exist_ok=True)
+    for name, entity_records in records.items():
+        write_snapshot(
+            snapshot_path(name), version=version, records=entity_records
+        )
+
+    return version
+
+
+readers: Dict[str, SnapshotReader] = (
+    {name: SnapshotReader(snapshot_path(name)) for name in COLUMNS}
+    if settings.SHARED_CACHE_PATH
+    else {}
+)
+
+
+def fresh_reader(name: str) -> Optional[SnapshotReader]:
+    """
+    Returns the reader of the entity's snapshot if it may be served from:
+    it includes every write this worker knows about
+    and its refresher is alive.
+    """
+    reader = readers.get(name)
+    if reader is None or not reader.refresh():
+        return None
+
+    if reader.version <= db.last_change_xid:
+        return None
+
+    if reader.age() > settings.SHARED_CACHE_MAX_AGE:
+        return None
+
+    return reader
+
+
+def get(name: str, key: UUID) -> Optional[BaseModel]:
+    reader = fresh_reader(name)
+    if reader is None:
+        return None
+
+    value = reader.get(key)
+    if value is None:
+        return None
+
+    return MODELS[name].parse_raw(value)
+
+
+def get_many(name: str, keys: Iterable[UUID]) -> Dict[UUID, BaseModel]:
+    """
+    Returns the found ones only.
+    """
+    reader = fresh_reader(name)
+    if reader is None:
+        return {}
+
+    found = {}
+    for key in keys:
+        value = reader.get(key)
+        if value is not None:
+            found[key] = MODELS[name].parse_raw(value)
+
+    return found
+
+
+def list_all(name: str) -> Optional[List[BaseModel]]:
+    reader = fresh_reader(name)
+    if reader is None:
+        return None
+
+    return [MODELS[name].parse_raw(value) for _key, value in reader.items()]
+
+
+def stats() -> Dict:
+    result = {}
+    for name, reader in readers.items():
+        exists = reader.refresh()
+        result[name] = {
+            "age": round(reader.age(), 3) if exists else None,
+            "fresh": fresh_reader(name) is not None,
+            "records": reader.count,
+            "version": reader.version,
+        }
+
+    return result
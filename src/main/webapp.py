@@ -1,25 +1,309 @@
 import secrets
+from datetime import date
+from datetime import datetime
+from datetime import time
+from datetime import timezone
+from pathlib import Path
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
 from uuid import UUID
 
 from fastapi import Depends
 from fastapi import FastAPI
+from fastapi import Header
 from fastapi import HTTPException
+from fastapi import Query
+from fastapi.encoders import jsonable_encoder
 from fastapi.security import HTTPBasic
 from fastapi.security import HTTPBasicCredentials
 from starlette import status
 from starlette.requests import Request
+from starlette.responses import JSONResponse
 from starlette.responses import Response
-
+from starlette.responses import StreamingResponse
+
+from framework.admission import AdmissionControlMiddleware
+from framework.admission import Gate
+from framework.compression import CompressionCache
+from framework.compression import CompressionMiddleware
+from framework.config import settings
+from framework.deadlines import DeadlineExceededError
+from framework.deadlines import DeadlineMiddleware
+from framework.group_commit import GroupCommit
+from framework.idempotency import IdempotencyMiddleware
 from framework.logging import debug
 from framework.logging import logger
+from framework.loop_monitor import LoopMonitor
+from framework.profiler import ProfilingMiddleware
+from framework.profiler import SamplingProfiler
+from framework.singleflight import SingleFlight
 from main import db
+from main import events
+from main import idempotency
+from main import jobs
+from main import shared_cache
 from main.custom_types import AssignmentT
+from main.custom_types import IdsT
+from main.custom_types import JobT
 from main.custom_types import ProjectT
 from main.custom_types import UserT
 
 application = FastAPI()
 security = HTTPBasic()
 
+admission_gates = {
+    "read": Gate(
+        limit=settings.ADMISSION_READ_LIMIT,
+        queue_size=settings.ADMISSION_QUEUE_SIZE,
+        queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+    ),
+    "write": Gate(
+        limit=settings.ADMISSION_WRITE_LIMIT,
+        queue_size=settings.ADMISSION_QUEUE_SIZE,
+        queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+    ),
+}
+
+# Grouped upserts of assignments share a transaction per batch:
+# they are admitted by their own gate, so batches may fill up
+# beyond the write limit.
+admission_gate_paths = {}
+if settings.ASSIGNMENTS_GROUP_COMMIT:
+    admission_gates["batched"] = Gate(
+        limit=settings.ASSIGNMENTS_GROUP_COMMIT_MAX_SIZE,
+        queue_size=settings.ADMISSION_QUEUE_SIZE,
+        queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+    )
+    admission_gate_paths[("PUT", "/assignments")] = "batched"
+
+application.add_middleware(
+    IdempotencyMiddleware,
+    store=idempotency.build_store(),
+)
+
+compression_cache = CompressionCache(
+    max_entries=settings.COMPRESSION_CACHE_SIZE,
+)
+
+application.add_middleware(
+    CompressionMiddleware,
+    cache=compression_cache,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+)
+
+application.add_middleware(
+    AdmissionControlMiddleware,
+    gates=admission_gates,
+    retry_after=settings.ADMISSION_RETRY_AFTER,
+    exempt_paths={"/events"},
+    read_paths={"/projects/lookup", "/users/lookup"},
+    gate_paths=admission_gate_paths,
+)
+
+profiler = (
+    SamplingProfiler(
+        directory=Path(settings.PROFILER_DIR),
+        interval=settings.PROFILER_INTERVAL,
+    )
+    if settings.PROFILER_DIR
+    else None
+)
+
+
+async def profiling_allowed(scope) -> bool:
+    request = Request(scope)
+    try:
+        credentials = await security(request)
+        await get_current_user(credentials)
+    except HTTPException:
+        return False
+
+    return True
+
+
+if profiler is not None:
+    application.add_middleware(
+        ProfilingMiddleware,
+        profiler=profiler,
+        authorize=profiling_allowed,
+        sample_rate=settings.PROFILER_SAMPLE_RATE,
+        exempt_paths={"/events"},
+    )
+
+application.add_middleware(
+    DeadlineMiddleware,
+    timeout=settings.REQUEST_TIMEOUT,
+    exempt_paths={"/events"},
+)
+
+responses = SingleFlight()
+
+
+async def flush_assignments(values: List[Dict[str, Any]]) -> List[Any]:
+    try:
+        return await db.upsert_assignments(values)
+    except db.BadAssignmentError:
+        # a bad one fails the whole batch: the rest are upserted one by one
+        results = []
+        for value in values:
+            try:
+                results.append(await db.upsert_assignment(**value))
+            except db.BadAssignmentError as err:
+                results.append(err)
+        return results
+
+
+assignment_writes = (
+    GroupCommit(
+        flush_assignments,
+        window=settings.ASSIGNMENTS_GROUP_COMMIT_WINDOW,
+        max_size=settings.ASSIGNMENTS_GROUP_COMMIT_MAX_SIZE,
+    )
+    if settings.ASSIGNMENTS_GROUP_COMMIT
+    else None
+)
+
+loop_monitor = LoopMonitor(
+    interval=settings.LOOP_MONITOR_INTERVAL,
+    threshold=settings.LOOP_MONITOR_THRESHOLD,
+    max_samples=settings.LOOP_MONITOR_SAMPLES,
+)
+
+
+@application.exception_handler(DeadlineExceededError)
+async def deadline_exceeded(_request: Request, _exc: DeadlineExceededError):
+    return JSONResponse(
+        {"errors": ["deadline exceeded"]},
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+    )
+
+
+async def coalesced_json(key: str, build) -> Response:
+    async def encode() -> bytes:
+        payload = await build()
+        return JSONResponse(jsonable_encoder(payload)).body
+
+    body = await responses.do(key, encode)
+    return Response(content=body, media_type="application/json")
+
+
+def parse_ids(values: List[str]) -> List[UUID]:
+    """
+    Accepts both repeated (?ids=a&ids=b) and comma-separated (?ids=a,b) ids.
+    """
+    ids = []
+    for value in values:
+        for item in filter(bool, value.split(",")):
+            try:
+                ids.append(UUID(item.strip()))
+            except ValueError as err:
+                raise ValueError(f"invalid id: {item}") from err
+    return ids
+
+
+async def lookup(
+    ids: List[UUID],
+    response: Response,
+    *,
+    entity: str,
+    fetch,
+    serialize,
+):
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > settings.BATCH_LOOKUP_MAX_IDS:
+        response.status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+        return {
+            "errors": [
+                f"too many ids: at most {settings.BATCH_LOOKUP_MAX_IDS}"
+                " are allowed"
+            ]
+        }
+
+    found = shared_cache.get_many(f"{entity}s", ids)
+    missing = tuple(_id for _id in ids if _id not in found)
+    objs = await fetch(missing) if missing else []
+    found.update({obj.id: obj for obj in objs})
+
+    payload = {"data": [serialize(found[_id]) for _id in ids if _id in found]}
+    missing = [_id for _id in ids if _id not in found]
+    if missing:
+        payload["errors"] = [f"{entity} not found: {_id}" for _id in missing]
+
+    return payload
+
+
+async def lookup_users(ids: List[UUID], response: Response):
+    return await lookup(
+        ids,
+        response,
+        entity="user",
+        fetch=lambda _ids: db.get_users(user_ids=_ids),
+        serialize=lambda obj: UserT.from_orm(obj).copy(exclude={"password"}),
+    )
+
+
+async def lookup_projects(ids: List[UUID], response: Response):
+    return await lookup(
+        ids,
+        response,
+        entity="project",
+        fetch=lambda _ids: db.get_projects(project_ids=_ids),
+        serialize=ProjectT.from_orm,
+    )
+
+
+def parse_names(value: Optional[str], allowed: Tuple[str, ...]):
+    if value is None:
+        return None
+
+    names = tuple(filter(bool, (name.strip() for name in value.split(","))))
+    unknown = sorted(set(names) - set(allowed))
+    if unknown:
+        raise ValueError(f"unknown names: {', '.join(unknown)}")
+
+    return tuple(name for name in allowed if name in names)
+
+
+def serialize_assignment(row, *, fields, expand) -> dict:
+    data = {}
+
+    if "user" in expand:
+        data["user"] = UserT.from_orm(row.User)
+    if "project" in expand:
+        data["project"] = ProjectT.from_orm(row.Project)
+
+    for field in fields:
+        data[field] = getattr(row, field)
+
+    return data
+
+
+COUNT_MODES = "^(estimate|exact)$"
+
+
+async def total_count(table, count: str, *, where=None, key=()) -> str:
+    total = await db.count_rows(
+        table, exact=count == "exact", where=where, key=key
+    )
+    return str(total)
+
+
+def moment(value: Union[datetime, date]) -> datetime:
+    """
+    A date stands for its very end, a naive datetime is in UTC.
+    """
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, time.max)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
 
 def raise_401():
     raise HTTPException(
@@ -81,20 +365,65 @@ async def handler(request: Request, user=Depends(get_current_user)):
     }
 
 
+@application.head("/users")
+async def handler(count: str = Query("estimate", regex=COUNT_MODES)):
+    total = await total_count(db.User.__table__, count)
+    return Response(headers={"X-Total-Count": total})
+
+
 @application.get("/users")
-async def handler():
-    objs = await db.list_users()
-    return {
-        "data": [
-            UserT.from_orm(obj).copy(exclude={"password"}) for obj in objs
-        ]
-    }
+async def handler(
+    response: Response,
+    ids: Optional[List[str]] = Query(None),
+    count: str = Query("estimate", regex=COUNT_MODES),
+    q: Optional[str] = Query(None, min_length=1),
+    limit: int = Query(
+        settings.SEARCH_LIMIT, ge=1, le=settings.SEARCH_LIMIT_MAX
+    ),
+):
+    if ids is not None:
+        try:
+            return await lookup_users(parse_ids(ids), response)
+        except ValueError as err:
+            response.status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+            return {"errors": [str(err)]}
+
+    if q is not None:
+        objs = await db.search_users(query=q, limit=limit)
+        return {
+            "data": [
+                UserT.from_orm(obj).copy(exclude={"password"}) for obj in objs
+            ]
+        }
+
+    async def build():
+        objs = shared_cache.list_all("users")
+        if objs is None:
+            objs = await db.list_users()
+        return {
+            "data": [
+                UserT.from_orm(obj).copy(exclude={"password"}) for obj in objs
+            ]
+        }
+
+    response = await coalesced_json("users", build)
+    response.headers["X-Total-Count"] = await total_count(
+        db.User.__table__, count
+    )
+    return response
+
+
+@application.post("/users/lookup")
+async def handler(lookup_ids: IdsT, response: Response):
+    return await lookup_users(lookup_ids.ids, response)
 
 
 @application.get("/users/{user_id}")
 async def handler(user_id: UUID, response: Response):
     try:
-        obj = await db.get_user(user_id=user_id)
+        obj = shared_cache.get("users", user_id)
+        if obj is None:
+            obj = await db.get_user(user_id=user_id)
         user = UserT.from_orm(obj).copy(exclude={"password"})
         return {"data": user}
     except db.UserNotFoundError:
@@ -115,17 +444,58 @@ async def handler(user: UserT, admin=Depends(get_current_user)):
         return {"errors": ["user already exists"]}
 
 
+@application.head("/projects")
+async def handler(count: str = Query("estimate", regex=COUNT_MODES)):
+    total = await total_count(db.Project.__table__, count)
+    return Response(headers={"X-Total-Count": total})
+
+
 @application.get("/projects")
-async def handler():
-    objs = await db.list_projects()
-    debug(objs)
-    return {"data": [ProjectT.from_orm(obj) for obj in objs]}
+async def handler(
+    response: Response,
+    ids: Optional[List[str]] = Query(None),
+    count: str = Query("estimate", regex=COUNT_MODES),
+    q: Optional[str] = Query(None, min_length=1),
+    limit: int = Query(
+        settings.SEARCH_LIMIT, ge=1, le=settings.SEARCH_LIMIT_MAX
+    ),
+):
+    if ids is not None:
+        try:
+            return await lookup_projects(parse_ids(ids), response)
+        except ValueError as err:
+            response.status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+            return {"errors": [str(err)]}
+
+    if q is not None:
+        objs = await db.search_projects(query=q, limit=limit)
+        return {"data": [ProjectT.from_orm(obj) for obj in objs]}
+
+    async def build():
+        objs = shared_cache.list_all("projects")
+        if objs is None:
+            objs = await db.list_projects()
+        debug(objs)
+        return {"data": [ProjectT.from_orm(obj) for obj in objs]}
+
+    response = await coalesced_json("projects", build)
+    response.headers["X-Total-Count"] = await total_count(
+        db.Project.__table__, count
+    )
+    return response
+
+
+@application.post("/projects/lookup")
+async def handler(lookup_ids: IdsT, response: Response):
+    return await lookup_projects(lookup_ids.ids, response)
 
 
 @application.get("/projects/{project_id}")
 async def handler(project_id: UUID, response: Response):
     try:
-        obj = await db.get_project(project_id=project_id)
+        obj = shared_cache.get("projects", project_id)
+        if obj is None:
+            obj = await db.get_project(project_id=project_id)
         user = ProjectT.from_orm(obj)
         return {"data": user}
     except db.ProjectNotFoundError:
@@ -144,29 +514,208 @@ async def handler(project: ProjectT, admin=Depends(get_current_user)):
         return {"errors": ["project already exists"]}
 
 
+@application.head("/assignments")
+async def handler(count: str = Query("estimate", regex=COUNT_MODES)):
+    total = await total_count(db.Assignment.__table__, count)
+    return Response(headers={"X-Total-Count": total})
+
+
 @application.get("/assignments")
-async def handler():
-    objs = await db.list_assignments()
-    assignments = [AssignmentT.from_orm(obj) for obj in objs]
-    return {"data": assignments}
+async def handler(
+    response: Response,
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
+    count: str = Query("estimate", regex=COUNT_MODES),
+    as_of: Optional[Union[datetime, date]] = None,
+):
+    try:
+        fields = parse_names(fields, db.ASSIGNMENT_FIELDS)
+        expand = parse_names(expand, db.ASSIGNMENT_EXPANSIONS)
+    except ValueError as err:
+        response.status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+        return {"errors": [str(err)]}
+
+    if expand is None:
+        expand = db.ASSIGNMENT_EXPANSIONS if fields is None else ()
+    if fields is None:
+        fields = db.ASSIGNMENT_FIELDS
+
+    if not fields and not expand:
+        response.status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+        return {"errors": ["nothing to select"]}
+
+    table, where = db.Assignment.__table__, None
+    if as_of is not None:
+        as_of = moment(as_of)
+        table = db.AssignmentHistory.__table__
+        where = db.assignment_history_at(as_of)
+
+    async def build():
+        rows = await db.list_assignments(
+            fields=fields, expand=expand, as_of=as_of
+        )
+        assignments = [
+            serialize_assignment(row, fields=fields, expand=expand)
+            for row in rows
+        ]
+        return {"data": assignments}
+
+    key = f"assignments?fields={','.join(fields)}&expand={','.join(expand)}"
+    if as_of is not None:
+        key += f"&as_of={as_of.isoformat()}"
+
+    response = await coalesced_json(key, build)
+    response.headers["X-Total-Count"] = await total_count(
+        table, count, where=where, key=as_of
+    )
+    return response
 
 
 @application.put("/assignments")
 async def handler(assignment: AssignmentT, admin=Depends(get_current_user)):
     logger.info(f"{admin = }")
+    values = {
+        "begins": assignment.begins,
+        "ends": assignment.ends,
+        "project_id": assignment.project_id,
+        "user_id": assignment.user_id,
+    }
     try:
-        obj = await db.upsert_assignment(
-            begins=assignment.begins,
-            ends=assignment.ends,
-            project_id=assignment.project_id,
-            user_id=assignment.user_id,
-        )
+        if assignment_writes is not None:
+            obj = await assignment_writes.submit(values)
+        else:
+            obj = await db.upsert_assignment(**values)
         assignment: AssignmentT = AssignmentT.from_orm(obj)
         return {"data": assignment}
     except db.BadAssignmentError as err:
         return {"errors": [str(err)]}
 
 
+@application.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def handler(
+    job: JobT,
+    response: Response,
+    admin=Depends(get_current_user),
+):
+    if job.kind not in jobs.HANDLERS:
+        response.status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+        return {"errors": [f"unknown job kind: {job.kind}"]}
+
+    obj = await db.enqueue_job(
+        kind=job.kind,
+        payload=job.payload,
+        max_attempts=job.max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+
+    await jobs.runner.start()
+    jobs.runner.wake()
+
+    return {"data": JobT.from_orm(obj)}
+
+
+@application.get("/jobs/{job_id}")
+async def handler(
+    job_id: UUID,
+    response: Response,
+    admin=Depends(get_current_user),
+):
+    try:
+        obj = await db.get_job(job_id=job_id)
+        return {"data": JobT.from_orm(obj)}
+    except db.JobNotFoundError:
+        response.status_code = status.HTTP_404_NOT_FOUND
+        return {"errors": ["job not found"]}
+
+
+@application.get("/events")
+async def handler(last_event_id: Optional[int] = Header(None)):
+    subscription = await events.feed.subscribe(last_event_id)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                event = await subscription.get(
+                    timeout=settings.EVENTS_HEARTBEAT_INTERVAL
+                )
+                if event is None:
+                    yield ": ping\n\n"
+                else:
+                    yield events.format_sse(event)
+        except events.SubscriptionClosedError:
+            pass
+        finally:
+            subscription.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+@application.get("/internal/stats")
+async def handler(admin=Depends(get_current_user)):
+    return {
+        "data": {
+            "admission": {
+                name: gate.stats() for name, gate in admission_gates.items()
+            },
+            "compression": compression_cache.stats(),
+            "group_commit": {
+                "assignments": (
+                    assignment_writes.stats()
+                    if assignment_writes is not None
+                    else None
+                ),
+            },
+            "loop": loop_monitor.stats() if loop_monitor.running else None,
+            "pool": db.pool_stats(),
+            "shared_cache": shared_cache.stats(),
+            "singleflight": {
+                "db": db.reads.stats(),
+                "responses": responses.stats(),
+            },
+        }
+    }
+
+
+@application.get("/internal/slow-queries")
+async def handler(admin=Depends(get_current_user)):
+    return {"data": db.slow_queries.recent()}
+
+
+@application.post("/internal/profile", status_code=status.HTTP_202_ACCEPTED)
+async def handler(
+    response: Response,
+    seconds: float = Query(10.0, gt=0, le=settings.PROFILER_WINDOW_MAX),
+    admin=Depends(get_current_user),
+):
+    if profiler is None:
+        response.status_code = status.HTTP_404_NOT_FOUND
+        return {"errors": ["profiler is not configured"]}
+
+    path = profiler.start_window(seconds)
+    return {"data": {"profile": path.name, "seconds": seconds}}
+
+
+@application.on_event("startup")
+async def startup():
+    # keeps table versions (cached counts, the shared cache) in step
+    # with writes of other workers
+    await events.feed.start()
+    if settings.LOOP_MONITOR:
+        loop_monitor.start()
+    await jobs.runner.start()
+
+
+@application.on_event("shutdown")
+async def shutdown():
+    await loop_monitor.stop()
+    await jobs.runner.stop()
+    await events.feed.stop()
+
+
 if __name__ == "__main__":
     import uvicorn
 
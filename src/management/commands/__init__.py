@@ -1,2 +1,6 @@
 from .abstract import COMMANDS
+from .assignments import AssignmentsCommand
 from .db_config import DbConfigCommand
+from .db_stats import DbStatsCommand
+from .retention import RetentionCommand
+from .shared_cache import SharedCacheCommand
@@ -0,0 +1,39 @@
+from delorean import Delorean
+
+from framework.config import settings
+from management.commands.abstract import ManagementCommand
+
+
+class AssignmentsCommand(ManagementCommand):
+    name = "assignments"
+    help = "Assignments maintenance command"
+    arguments = {
+        "--archive": "Moves assignments which have ended to the archive",
+        "--partitions": (
+            "Creates partitions for the current and the next year"
+            " (partitioned layout only)"
+        ),
+    }
+    required = True
+
+    def __call__(self):
+        from main import db  # the engine needs a configured database
+
+        today = Delorean().date
+
+        if self.option_is_active("--archive"):
+            result = db.purge_assignments(
+                before=today,
+                archive=True,
+                batch_size=settings.RETENTION_BATCH_SIZE,
+                pause=settings.RETENTION_PAUSE,
+            )
+            print(f"archived assignments: {result.rows}")
+        elif self.option_is_active("--partitions"):
+            if not db.ASSIGNMENTS_PARTITIONED:
+                raise RuntimeError("assignments are not partitioned")
+
+            created = db.create_assignment_partitions(
+                years=(today.year, today.year + 1)
+            )
+            print(f"created partitions: {', '.join(created) or 'none'}")
@@ -0,0 +1,251 @@
+import json
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from management.commands.abstract import ManagementCommand
+
+TABLES = ("assignments", "projects", "users")
+
+# average rows read by one sequential scan
+# above which a table is likely missing an index
+SEQ_SCAN_ROWS_THRESHOLD = 1000
+
+TOP_QUERIES = 10
+
+Report = Dict[str, Any]
+
+# a table is reported together with its partitions (if any)
+_q_tables = text(
+    """
+    select
+        c.relname as "table",
+        sum(pg_table_size(t.relid))::bigint as table_bytes,
+        sum(pg_indexes_size(t.relid))::bigint as indexes_bytes,
+        sum(coalesce(s.n_live_tup, 0))::bigint as live_rows,
+        sum(coalesce(s.n_dead_tup, 0))::bigint as dead_rows,
+        sum(coalesce(s.seq_scan, 0))::bigint as seq_scans,
+        sum(coalesce(s.seq_tup_read, 0))::bigint as seq_rows_read,
+        sum(coalesce(s.idx_scan, 0))::bigint as index_scans,
+        max(greatest(s.last_vacuum, s.last_autovacuum)) as last_vacuum,
+        max(greatest(s.last_analyze, s.last_autoanalyze)) as last_analyze
+    from pg_class as c
+    cross join lateral (
+        select c.oid as relid
+        union
+        select relid from pg_partition_tree(c.oid)
+    ) as t
+    left join pg_stat_user_tables as s on s.relid = t.relid
+    where c.oid = any(cast(:tables as regclass[]))
+    group by c.relname
+    order by c.relname
+    """
+)
+
+_q_indexes = text(
+    """
+    select
+        t.relid::regclass::text as "table",
+        i.relname as index,
+        pg_relation_size(i.oid) as bytes,
+        coalesce(s.idx_scan, 0) as scans,
+        x.indisunique as is_unique,
+        x.indisprimary as is_primary
+    from pg_class as c
+    cross join lateral (
+        select c.oid as relid
+        union
+        select relid from pg_partition_tree(c.oid)
+    ) as t
+    join pg_index as x on x.indrelid = t.relid
+    join pg_class as i on i.oid = x.indexrelid
+    left join pg_stat_user_indexes as s on s.indexrelid = x.indexrelid
+    where c.oid = any(cast(:tables as regclass[]))
+    order by 1, 2
+    """
+)
+
+_q_unindexed_foreign_keys = text(
+    """
+    select
+        f.conrelid::regclass::text as "table",
+        a.attname as "column",
+        f.conname as "constraint"
+    from pg_constraint as f
+    join pg_attribute as a
+        on a.attrelid = f.conrelid and a.attnum = f.conkey[1]
+    where f.contype = 'f'
+        and f.conrelid = any(cast(:tables as regclass[]))
+        and not exists (
+            select from pg_index as x
+            where x.indrelid = f.conrelid and x.indkey[0] = f.conkey[1]
+        )
+    order by 1, 2
+    """
+)
+
+_q_has_pg_stat_statements = text(
+    "select exists"
+    " (select from pg_extension where extname = 'pg_stat_statements')"
+)
+
+_q_top_queries = text(
+    """
+    select
+        left(regexp_replace(query, '\\s+', ' ', 'g'), 200) as query,
+        calls,
+        round(total_exec_time::numeric, 3)::float8 as total_ms,
+        round(mean_exec_time::numeric, 3)::float8 as mean_ms,
+        rows
+    from pg_stat_statements
+    where dbid = (
+        select oid from pg_database where datname = current_database()
+    )
+    order by total_exec_time desc
+    limit :limit
+    """
+)
+
+
+def collect(bind) -> Report:
+    with bind.connect() as connection:
+        tables = [
+            dict(row._mapping)
+            for row in connection.execute(_q_tables, {"tables": list(TABLES)})
+        ]
+        indexes = [
+            dict(row._mapping)
+            for row in connection.execute(_q_indexes, {"tables": list(TABLES)})
+        ]
+        unindexed_foreign_keys = [
+            dict(row._mapping)
+            for row in connection.execute(
+                _q_unindexed_foreign_keys, {"tables": list(TABLES)}
+            )
+        ]
+
+    for table in tables:
+        # dead tuples are the space a vacuum would reclaim
+        rows = table["live_rows"] + table["dead_rows"]
+        ratio = table["dead_rows"] / rows if rows else 0.0
+        table["bloat_ratio"] = round(ratio, 4)
+        table["bloat_bytes"] = int(table["table_bytes"] * ratio)
+
+    return {
+        "tables": tables,
+        "indexes": indexes,
+        "unused_indexes": [
+            index
+            for index in indexes
+            if not index["scans"]
+            and not index["is_unique"]
+            and not index["is_primary"]
+        ],
+        "missing_indexes": {
+            "foreign_keys": unindexed_foreign_keys,
+            "seq_scan_heavy": [
+                table["table"]
+                for table in tables
+                if table["seq_scans"]
+                and table["seq_rows_read"] / table["seq_scans"]
+                > SEQ_SCAN_ROWS_THRESHOLD
+                and table["seq_scans"] > table["index_scans"]
+            ],
+        },
+        "top_queries": collect_top_queries(bind),
+    }
+
+
+def collect_top_queries(bind) -> Optional[List[Dict[str, Any]]]:
+    """
+    Returns None if pg_stat_statements is not available.
+    """
+    try:
+        with bind.connect() as connection:
+            if not connection.execute(_q_has_pg_stat_statements).scalar_one():
+                return None
+
+            result = connection.execute(_q_top_queries, {"limit": TOP_QUERIES})
+            return [dict(row._mapping) for row in result]
+    except DBAPIError:
+        # the extension exists but is not in shared_preload_libraries
+        return None
+
+
+def format_text(report: Report) -> str:
+    lines = ["TABLES"]
+    for table in report["tables"]:
+        lines.append(
+            f"  {table['table']}:"
+            f" table {format_bytes(table['table_bytes'])},"
+            f" indexes {format_bytes(table['indexes_bytes'])},"
+            f" rows {table['live_rows']},"
+            f" dead {table['dead_rows']} ({table['bloat_ratio']:.1%}),"
+            f" seq scans {table['seq_scans']},"
+            f" index scans {table['index_scans']}"
+        )
+
+    lines.append("INDEXES")
+    for index in report["indexes"]:
+        lines.append(
+            f"  {index['table']}.{index['index']}:"
+            f" {format_bytes(index['bytes'])}, scans {index['scans']}"
+        )
+
+    lines.append("UNUSED INDEXES")
+    for index in report["unused_indexes"]:
+        lines.append(f"  {index['table']}.{index['index']}")
+
+    lines.append("MISSING INDEXES")
+    for fk in report["missing_indexes"]["foreign_keys"]:
+        lines.append(
+            f"  {fk['table']}.{fk['column']}:"
+            f" foreign key {fk['constraint']} is not indexed"
+        )
+    for table in report["missing_indexes"]["seq_scan_heavy"]:
+        lines.append(f"  {table}: mostly read by sequential scans")
+
+    lines.append("TOP QUERIES")
+    if report["top_queries"] is None:
+        lines.append("  pg_stat_statements is not available")
+    for query in report["top_queries"] or ():
+        lines.append(
+            f"  {query['total_ms']} ms total, {query['mean_ms']} ms mean,"
+            f" {query['calls']} calls: {query['query']}"
+        )
+
+    return "\n".join(lines)
+
+
+def format_bytes(size: int) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+
+    return f"{size:.1f} TiB"
+
+
+class DbStatsCommand(ManagementCommand):
+    name = "db-stats"
+    help = (
+        "DB diagnostics command: sizes, bloat, unused and missing indexes,"
+        " top queries"
+    )
+    arguments = {
+        "--json": "Prints the report as JSON",
+    }
+
+    def __call__(self):
+        from main import db  # the engine needs a configured database
+
+        report = collect(db.engine_sync)
+
+        if self.option_is_active("--json"):
+            print(json.dumps(report, indent=2, default=str))
+        else:
+            print(format_text(report))
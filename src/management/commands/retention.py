@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from delorean import Delorean
+
+from framework.config import settings
+from management.commands.abstract import ManagementCommand
+
+
+class RetentionCommand(ManagementCommand):
+    name = "retention"
+    help = (
+        "Purges assignments which have ended more than RETENTION_DAYS ago."
+        " If called without arguments, uses RETENTION_MODE"
+    )
+    arguments = {
+        "--archive": "Moves the assignments to the archive",
+        "--delete": "Deletes the assignments",
+    }
+
+    def __call__(self):
+        from main import db  # the engine needs a configured database
+
+        if self.option_is_active("--archive"):
+            archive = True
+        elif self.option_is_active("--delete"):
+            archive = False
+        else:
+            archive = settings.RETENTION_MODE == "archive"
+
+        before = Delorean().date - timedelta(days=settings.RETENTION_DAYS)
+
+        result = db.purge_assignments(
+            before=before,
+            archive=archive,
+            batch_size=settings.RETENTION_BATCH_SIZE,
+            pause=settings.RETENTION_PAUSE,
+        )
+
+        action = "archived" if archive else "deleted"
+        print(
+            f"{action} assignments ended before {before}: {result.rows}"
+            f" in {result.batches} batches, {result.seconds:.2f}s,"
+            f" {result.rows_per_second:.1f} rows/s"
+        )
@@ -0,0 +1,45 @@
+import time
+
+from framework.config import settings
+from framework.logging import logger
+from management.commands.abstract import ManagementCommand
+
+
+class SharedCacheCommand(ManagementCommand):
+    name = "shared-cache"
+    help = (
+        "Refreshes the shared snapshot of users and projects"
+        " in SHARED_CACHE_PATH every SHARED_CACHE_REFRESH_INTERVAL seconds."
+        " Run one per host"
+    )
+    arguments = {
+        "--once": "Refreshes the snapshot once and exits",
+    }
+
+    def __call__(self):
+        if not settings.SHARED_CACHE_PATH:
+            raise RuntimeError("SHARED_CACHE_PATH is not set")
+
+        # the engine needs a configured database
+        from main import shared_cache
+
+        while True:
+            started = time.monotonic()
+            try:
+                version = shared_cache.refresh()
+            except Exception as err:
+                if self.option_is_active("--once"):
+                    raise
+                # workers fall back to the db once the snapshot gets old
+                logger.error(f"shared cache is not refreshed: {err}")
+            else:
+                logger.debug(
+                    f"shared cache version {version} is written"
+                    f" in {time.monotonic() - started:.3f}s"
+                )
+
+            if self.option_is_active("--once"):
+                print(f"shared cache version: {version}")
+                return
+
+            time.sleep(settings.SHARED_CACHE_REFRESH_INTERVAL)
@@ -0,0 +1,23 @@
+import json
+from typing import Dict
+from typing import Generator
+
+import pytest
+
+from framework.dirs import DIR_TEST_ARTIFACTS
+from framework.logging import logger
+
+DIR_BENCHMARKS = DIR_TEST_ARTIFACTS / "benchmarks"
+
+
+@pytest.fixture(scope="function")
+def benchmark_report(request) -> Generator[Dict, None, None]:
+    report = {}
+
+    yield report
+
+    DIR_BENCHMARKS.mkdir(exist_ok=True)
+    path = DIR_BENCHMARKS / f"{request.node.name}.json"
+    path.write_text(json.dumps(report, indent=2, default=str))
+
+    logger.info(f"{request.node.name}: {json.dumps(report, default=str)}")
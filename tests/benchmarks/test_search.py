@@ -0,0 +1,69 @@
+import os
+
+import pytest
+from sqlalchemy import text
+
+from main import db
+from tests.benchmarks.timing import measure
+
+pytestmark = [
+    pytest.mark.benchmark,
+]
+
+ROUNDS = 5
+ROWS = int(os.environ.get("BENCHMARK_SEARCH_ROWS", 1_000_000))
+
+
+def test_name_search(benchmark_report):
+    """
+    Searches 1M user names with and without the trigram index.
+    Everything is rolled back afterwards.
+    """
+    with db.engine_sync.connect() as connection:
+        transaction = connection.begin()
+        try:
+            if not connection.execute(db._q_has_trgm).scalar_one():
+                pytest.skip("pg_trgm is not available")
+
+            connection.execute(
+                text(
+                    "insert into users (name)"
+                    " select 'user-' || md5(i::text)"
+                    " from generate_series(1, :rows) as i"
+                ),
+                {"rows": ROWS},
+            )
+            connection.execute(text("analyze users"))
+
+            name = connection.execute(
+                text("select 'user-' || md5('42')")
+            ).scalar_one()
+            queries = {
+                "prefix": name[:12],
+                "substring": name[10:18],
+                "fuzzy": name[:-2] + name[-1] + name[-2],
+            }
+
+            statement = db._q_search(db.User, fuzzy=True)
+
+            def search(query):
+                values = db._search_values(query, limit=20, fuzzy=True)
+                return lambda: connection.execute(statement, values).all()
+
+            report = {"rows": ROWS, "unit": "us/query"}
+            for kind, query in queries.items():
+                assert search(query)(), kind
+
+                connection.execute(text("set local enable_bitmapscan = off"))
+                scan = measure(search(query), rounds=ROUNDS)
+                connection.execute(text("set local enable_bitmapscan = on"))
+                index = measure(search(query), rounds=ROUNDS)
+
+                report[kind] = {"scan": scan, "index": index}
+        finally:
+            transaction.rollback()
+
+    benchmark_report.update(report)
+
+    for kind in queries:
+        assert report[kind]["index"] < report[kind]["scan"], kind
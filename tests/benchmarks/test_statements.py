@@ -0,0 +1,119 @@
+from uuid import uuid4
+
+import pytest
+from delorean import Delorean
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import joinedload
+from sqlalchemy.util import LRUCache
+
+from main import db
+from tests.benchmarks.timing import measure
+
+pytestmark = [
+    pytest.mark.benchmark,
+]
+
+ROUNDS = 2000
+
+
+Assignment = db.Assignment
+User = db.User
+
+UPSERT_KEYS = ["begins", "ends", "project_id", "user_id"]
+
+
+def compile_cached(statement, cache: LRUCache, column_keys=()):
+    """
+    Mimics what the engine does for every execution:
+    generates the cache key and takes the compiled form from the cache.
+    """
+    return statement._compile_w_cache(
+        dialect=db.engine.dialect,
+        compiled_cache=cache,
+        column_keys=list(column_keys),
+    )
+
+
+def build_get_user(user_id):
+    return select(User).where(User.id == user_id).limit(1)
+
+
+def build_upsert_assignment(project_id, user_id, begins, ends):
+    values = {
+        Assignment.project_id: project_id,
+        Assignment.user_id: user_id,
+        Assignment.begins: begins,
+        Assignment.ends: ends,
+    }
+
+    qi = (
+        insert(Assignment)
+        .values(values)
+        .on_conflict_do_update(
+            index_elements=[
+                Assignment.project_id,
+                Assignment.user_id,
+            ],
+            set_={
+                Assignment.begins: begins,
+                Assignment.ends: ends,
+            },
+        )
+        .returning(
+            Assignment.id,
+        )
+    )
+
+    qsf = lambda _id: (  # noqa: E731
+        select(Assignment)
+        .where(Assignment.id == _id)
+        .options(
+            joinedload(Assignment.project),
+            joinedload(Assignment.user),
+        )
+    )
+
+    return qi, qsf(uuid4())
+
+
+def test_statement_overhead(benchmark_report):
+    cache = LRUCache(500)
+    begins = Delorean().date
+
+    def before_get_user():
+        compile_cached(build_get_user(uuid4()), cache)
+
+    def after_get_user():
+        compile_cached(db._q_get_user_by_id, cache)
+
+    def before_upsert():
+        for statement in build_upsert_assignment(
+            uuid4(), uuid4(), begins, None
+        ):
+            compile_cached(statement, cache)
+
+    def after_upsert():
+        compile_cached(db._q_upsert_assignment, cache, UPSERT_KEYS)
+        compile_cached(db._q_get_assignment, cache)
+
+    for fn in (before_get_user, after_get_user, before_upsert, after_upsert):
+        fn()  # warm the compiled cache up
+
+    benchmark_report.update(
+        {
+            "unit": "us/call",
+            "get_user": {
+                "before": measure(before_get_user, rounds=ROUNDS),
+                "after": measure(after_get_user, rounds=ROUNDS),
+            },
+            "upsert_assignment": {
+                "before": measure(before_upsert, rounds=ROUNDS),
+                "after": measure(after_upsert, rounds=ROUNDS),
+            },
+        }
+    )
+
+    for name in ("get_user", "upsert_assignment"):
+        result = benchmark_report[name]
+        assert result["after"] < result["before"], name
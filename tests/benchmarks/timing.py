@@ -0,0 +1,14 @@
+import time
+from typing import Callable
+
+
+def measure(fn: Callable[[], object], *, rounds: int) -> float:
+    """
+    Returns the mean duration of one call in microseconds.
+    """
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    elapsed = time.perf_counter() - started
+
+    return elapsed / rounds * 1e6
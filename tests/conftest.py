@@ -0,0 +1,108 @@
+import os
+import time
+from urllib.parse import urlsplit
+from urllib.parse import urlunsplit
+
+from sqlalchemy import create_engine
+from sqlalchemy import text
+
+from framework.config import settings
+from framework.logging import logger
+
+TEMPLATE_SUFFIX = "template"
+
+
+def database_url(url: str, database: str) -> str:
+    components = urlsplit(url)
+    return urlunsplit(components._replace(path=f"/{database}", query=""))
+
+
+def database_name(url: str) -> str:
+    return urlsplit(url).path.lstrip("/")
+
+
+def sync_url(url: str) -> str:
+    return url.replace("postgres://", "postgresql://")
+
+
+def execute_on_server(*statements: str) -> None:
+    url = database_url(sync_url(settings.DATABASE_URL), "postgres")
+    engine = create_engine(url, isolation_level="AUTOCOMMIT")
+    try:
+        with engine.connect() as connection:
+            for statement in statements:
+                connection.execute(text(statement))
+    finally:
+        engine.dispose()
+
+
+def prepare_template() -> None:
+    """
+    Builds the schema once into a template database,
+    which xdist workers clone instead of creating tables themselves.
+    """
+    from main.db import create_tables
+
+    name = f"{database_name(settings.DATABASE_URL)}_{TEMPLATE_SUFFIX}"
+    execute_on_server(
+        f'drop database if exists "{name}" with (force)',
+        f'create database "{name}"',
+    )
+
+    engine = create_engine(database_url(sync_url(settings.DATABASE_URL), name))
+    try:
+        create_tables(engine)
+    finally:
+        engine.dispose()
+
+    logger.info(f"template database {name} is ready")
+
+
+def clone_template(worker: str) -> str:
+    base = database_name(settings.DATABASE_URL)
+    name = f"{base}_{worker}"
+    execute_on_server(
+        f'drop database if exists "{name}" with (force)',
+        f'create database "{name}" template "{base}_{TEMPLATE_SUFFIX}"',
+    )
+
+    return database_url(settings.DATABASE_URL, name)
+
+
+def pytest_configure(config):
+    config.started_at = time.perf_counter()
+
+    if not settings.DATABASE_URL:
+        return
+
+    worker = os.environ.get("PYTEST_XDIST_WORKER")
+    if worker:
+        # must happen before main.db is imported: it creates the engines
+        settings.DATABASE_URL = clone_template(worker)
+    elif getattr(config.option, "numprocesses", None):
+        prepare_template()
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if os.environ.get("PYTEST_XDIST_WORKER"):
+        return
+
+    reports = [
+        report
+        for reports in terminalreporter.stats.values()
+        for report in reports
+        if hasattr(report, "duration")
+    ]
+    if not reports:
+        return
+
+    wall_clock = time.perf_counter() - config.started_at
+    serial = sum(report.duration for report in reports)
+    workers = getattr(config.option, "numprocesses", None) or 1
+
+    terminalreporter.write_sep("-", "timing")
+    terminalreporter.write_line(
+        f"workers: {workers}, wall-clock: {wall_clock:.2f}s,"
+        f" sum of test durations: {serial:.2f}s,"
+        f" speedup: {serial / wall_clock:.2f}x"
+    )
@@ -1,8 +1,10 @@
 import asyncio
+from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
 import httpx
 import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from framework.config import settings
 from framework.logging import logger
@@ -41,16 +43,52 @@ async def web_client() -> AsyncGenerator[httpx.AsyncClient, None]:
         yield client
 
 
-@pytest.fixture(scope="function", autouse=True)
-async def clean_db() -> AsyncGenerator[None, None]:
-    yield
-
+async def truncate_tables() -> None:
     async with begin_session() as session:
         for table in Base.metadata.tables:
             logger.debug(f"truncating table {table}")
             await session.execute(f"truncate {table} cascade;")
 
 
+@pytest.fixture(scope="function", autouse=True)
+async def isolated_db(request, monkeypatch) -> AsyncGenerator[None, None]:
+    """
+    Runs every test in a transaction which is rolled back afterwards.
+    Each db session of the test works in its own savepoint.
+
+    Tests marked with `committing` need real commits
+    (e.g. to receive NOTIFY or to use several connections):
+    they run as is and the tables are truncated afterwards.
+    """
+    if request.node.get_closest_marker("committing"):
+        yield
+        await truncate_tables()
+        return
+
+    async with db.engine.connect() as connection:
+        transaction = await connection.begin()
+        lock = asyncio.Lock()
+
+        @asynccontextmanager
+        async def begin_nested_session():
+            # the connection is shared: sessions must not interleave on it
+            async with lock:
+                await connection.begin_nested()
+                async with AsyncSession(
+                    bind=connection,
+                    expire_on_commit=False,
+                    future=True,
+                ) as session:
+                    async with session.begin():
+                        yield session
+
+        monkeypatch.setattr(db, "begin_session", begin_nested_session)
+
+        yield
+
+        await transaction.rollback()
+
+
 @pytest.fixture(scope="function")
 async def admin() -> AsyncGenerator[UserT, None]:
     obj = await db.create_user(
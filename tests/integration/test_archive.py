@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+import pytest
+from delorean import Delorean
+from sqlalchemy import select
+
+from main import db
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.committing,
+    pytest.mark.functional,
+]
+
+
+async def test_closed_assignments_are_archived():
+    today = Delorean().date
+    user = await db.create_user(name="user")
+    closed = await db.create_project(name="closed")
+    current = await db.create_project(name="current")
+
+    await db.upsert_assignment(
+        project_id=closed.id,
+        user_id=user.id,
+        begins=today - timedelta(days=30),
+        ends=today - timedelta(days=1),
+    )
+    await db.upsert_assignment(
+        project_id=current.id,
+        user_id=user.id,
+        begins=today - timedelta(days=30),
+        ends=today,
+    )
+
+    assert archive(before=today) == 1
+    assert archive(before=today) == 0
+
+    rows = await db.list_assignments(fields=("project_id",), expand=())
+    assert [row.project_id for row in rows] == [current.id]
+
+    async with db.begin_session() as session:
+        result = await session.execute(select(db.assignments_archive))
+        archived = result.all()
+    assert [row.project_id for row in archived] == [closed.id]
+    assert archived[0].archived_at is not None
+
+    # the pair may be assigned again once its previous stint is archived
+    await db.upsert_assignment(
+        project_id=closed.id,
+        user_id=user.id,
+        begins=today,
+    )
+
+
+def archive(*, before) -> int:
+    result = db.purge_assignments(
+        before=before, archive=True, batch_size=1, pause=0
+    )
+    return result.rows
@@ -0,0 +1,34 @@
+import asyncio
+
+import httpx
+import pytest
+from starlette import status
+
+from main.custom_types import UserT
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.functional,
+]
+
+
+async def test_concurrent_list_requests_are_coalesced(
+    asgi_client: httpx.AsyncClient, admin: UserT
+):
+    auth = (admin.name, admin.password)
+
+    resp = await asgi_client.get("/internal/stats", auth=auth)
+    assert resp.status_code == status.HTTP_200_OK
+    before = resp.json()["data"]["singleflight"]["responses"]
+
+    responses = await asyncio.gather(
+        *(asgi_client.get("/users") for _ in range(10))
+    )
+    assert {resp.status_code for resp in responses} == {status.HTTP_200_OK}
+    assert len({resp.content for resp in responses}) == 1
+
+    resp = await asgi_client.get("/internal/stats", auth=auth)
+    after = resp.json()["data"]["singleflight"]["responses"]
+
+    assert after["calls"] - before["calls"] == 10
+    assert after["executions"] - before["executions"] < 10
@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+from main import db
+from management.commands.db_stats import TABLES
+from management.commands.db_stats import collect
+from management.commands.db_stats import format_text
+
+pytestmark = [
+    pytest.mark.functional,
+]
+
+
+def test_db_stats_report():
+    report = collect(db.engine_sync)
+
+    assert [table["table"] for table in report["tables"]] == list(TABLES)
+    assert {"users_pkey", "projects_pkey"} <= {
+        index["index"] for index in report["indexes"]
+    }
+    # constraint indexes are never reported as unused
+    assert not any(index["is_unique"] for index in report["unused_indexes"])
+    assert {
+        (fk["table"], fk["column"])
+        for fk in report["missing_indexes"]["foreign_keys"]
+    } <= {("assignments", "project_id"), ("assignments", "user_id")}
+
+    json.dumps(report, default=str)
+    assert format_text(report).startswith("TABLES\n")
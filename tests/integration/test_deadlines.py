@@ -0,0 +1,57 @@
+import httpx
+import pytest
+from sqlalchemy import text
+from starlette import status
+
+from framework import deadlines
+from framework.deadlines import DeadlineMiddleware
+from main import db
+from main.webapp import application
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.committing,
+    pytest.mark.functional,
+]
+
+
+def find_middleware(app, cls):
+    while not isinstance(app, cls):
+        app = app.app
+    return app
+
+
+async def test_slow_query_is_cancelled(
+    asgi_client: httpx.AsyncClient, monkeypatch
+):
+    async def list_users():
+        async with db.begin_session() as session:
+            await session.execute(text("select pg_sleep(5)"))
+
+    middleware = find_middleware(
+        application.middleware_stack, DeadlineMiddleware
+    )
+    monkeypatch.setattr(middleware, "timeout", 0.3)
+    monkeypatch.setattr(db, "list_users", list_users)
+
+    resp = await asgi_client.get("/users")
+    assert resp.status_code == status.HTTP_504_GATEWAY_TIMEOUT
+    assert resp.json() == {"errors": ["deadline exceeded"]}
+
+    # the connection is reusable afterwards
+    resp = await asgi_client.get("/projects")
+    assert resp.status_code == status.HTTP_200_OK
+
+
+async def test_statements_are_limited_by_the_deadline():
+    token = deadlines.start(0.2)
+    try:
+        with pytest.raises(deadlines.DeadlineExceededError):
+            async with db.begin_session() as session:
+                await session.execute(text("select pg_sleep(5)"))
+    finally:
+        deadlines._deadline.reset(token)
+
+    async with db.begin_session() as session:
+        result = await session.execute(text("show statement_timeout"))
+        assert result.scalar_one() == "0"
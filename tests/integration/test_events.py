@@ -0,0 +1,116 @@
+import json
+from typing import AsyncGenerator
+
+import pytest
+from delorean import Delorean
+
+from main import db
+from main.events import RESET
+from main.events import ChangeFeed
+from main.events import format_sse
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.committing,
+    pytest.mark.functional,
+]
+
+
+@pytest.fixture(scope="function")
+async def feed() -> AsyncGenerator[ChangeFeed, None]:
+    feed = ChangeFeed(backlog_size=10, queue_size=10)
+    yield feed
+    await feed.stop()
+
+
+async def test_writes_are_published(feed: ChangeFeed):
+    subscription = await feed.subscribe()
+
+    user = await db.create_user(name="user")
+    project = await db.create_project(name="project")
+    assignment = await db.upsert_assignment(
+        project_id=project.id,
+        user_id=user.id,
+        begins=Delorean().date,
+    )
+
+    got = [await subscription.get(timeout=2) for _ in range(3)]
+    assert [(event["entity"], event["op"], event["key"]) for event in got] == [
+        ("user", "create", str(user.id)),
+        ("project", "create", str(project.id)),
+        ("assignment", "upsert", str(assignment.id)),
+    ]
+    assert got[0]["id"] < got[1]["id"] < got[2]["id"]
+
+    sse = format_sse(got[0])
+    assert sse.startswith(f"id: {got[0]['id']}\nevent: user\ndata: {{")
+    assert sse.endswith("\n\n")
+
+
+async def test_batch_is_published_per_assignment(feed: ChangeFeed):
+    subscription = await feed.subscribe()
+
+    project = await db.create_project(name="project")
+    users = [await db.create_user(name=f"user{i}") for i in range(2)]
+    objs = await db.upsert_assignments(
+        [
+            {
+                "project_id": project.id,
+                "user_id": user.id,
+                "begins": Delorean().date,
+                "ends": None,
+            }
+            for user in users + users[:1]
+        ]
+    )
+
+    got = [await subscription.get(timeout=2) for _ in range(5)]
+    assert [(event["entity"], event["key"]) for event in got[3:]] == [
+        ("assignment", str(objs[0].id)),
+        ("assignment", str(objs[1].id)),
+    ]
+    assert got[3]["id"] < got[4]["id"]
+    assert got[3]["xid"] == got[4]["xid"]
+    assert await subscription.get(timeout=0.2) is None
+
+
+async def test_failed_write_is_not_published(feed: ChangeFeed):
+    subscription = await feed.subscribe()
+
+    await db.create_project(name="project")
+    with pytest.raises(db.ProjectAlreadyExistsError):
+        await db.create_project(name="project")
+
+    assert (await subscription.get(timeout=2))["op"] == "create"
+    assert await subscription.get(timeout=0.2) is None
+
+
+async def test_resume_from_last_event_id(feed: ChangeFeed):
+    subscription = await feed.subscribe()
+    await db.create_project(name="a")
+    await db.create_project(name="b")
+    first = await subscription.get(timeout=2)
+    second = await subscription.get(timeout=2)
+    subscription.close()
+
+    resumed = await feed.subscribe(last_event_id=first["id"])
+    assert await resumed.get(timeout=1) == second
+
+    stale = await feed.subscribe(last_event_id=first["id"] - 100)
+    assert (await stale.get(timeout=1))["entity"] == RESET
+
+
+async def test_resume_after_events_arrived_out_of_order():
+    feed = ChangeFeed(backlog_size=10, queue_size=10)
+    # the transaction which has taken id 10 commits after the one with 11
+    for event_id in (9, 11, 10, 12):
+        feed._on_notify(
+            None,
+            None,
+            db.CHANGES_CHANNEL,
+            json.dumps({"id": event_id, "entity": "unknown"}),
+        )
+
+    assert [event["id"] for event in feed.replay(11)] == [10, 12]
+    assert [event["id"] for event in feed.replay(12)] == []
+    assert feed.replay(8) == [{"id": 8, "entity": RESET}]
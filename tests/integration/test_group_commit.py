@@ -0,0 +1,126 @@
+import asyncio
+from datetime import date
+from uuid import uuid4
+
+import httpx
+import pytest
+from sqlalchemy import func
+from sqlalchemy import select
+from starlette import status
+
+from framework.group_commit import GroupCommit
+from main import db
+from main import webapp
+from main.custom_types import UserT
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.functional,
+]
+
+
+async def test_upsert_many(admin: UserT):
+    project = await db.create_project(name="project")
+    other = await db.create_user(name="other")
+
+    values = [
+        {
+            "project_id": project.id,
+            "user_id": admin.id,
+            "begins": date(2021, 1, 1),
+            "ends": None,
+        },
+        {
+            "project_id": project.id,
+            "user_id": other.id,
+            "begins": date(2021, 2, 1),
+            "ends": None,
+        },
+        {
+            "project_id": project.id,
+            "user_id": admin.id,
+            "begins": date(2021, 1, 1),
+            "ends": date(2021, 3, 1),
+        },
+    ]
+
+    objs = await db.upsert_assignments(values)
+
+    assert [obj.user_id for obj in objs] == [admin.id, other.id, admin.id]
+    assert objs[0].id == objs[2].id
+    # each upsert gets the assignment as it has left it
+    assert objs[0].ends is None
+    assert objs[2].ends == date(2021, 3, 1)
+    assert objs[1].project.name == "project"
+
+    async with db.begin_session() as session:
+        result = await session.execute(
+            select(func.count()).select_from(db.Assignment)
+        )
+        assert result.scalar_one() == 2
+
+        result = await session.execute(
+            select(db.AssignmentHistory.ends)
+            .where(db.AssignmentHistory.assignment_id == objs[0].id)
+            .where(func.upper_inf(db.AssignmentHistory.valid))
+        )
+        assert result.scalars().all() == [date(2021, 3, 1)]
+
+
+async def test_grouped_puts(
+    asgi_client: httpx.AsyncClient, admin: UserT, monkeypatch
+):
+    auth = (admin.name, admin.password)
+    project = await db.create_project(name="project")
+
+    group = GroupCommit(webapp.flush_assignments, window=0.05, max_size=10)
+    monkeypatch.setattr(webapp, "assignment_writes", group)
+
+    def put(user_id):
+        return asgi_client.put(
+            "/assignments",
+            auth=auth,
+            json={
+                "project_id": str(project.id),
+                "user_id": str(user_id),
+                "begins": "2021-01-01",
+            },
+        )
+
+    good, bad = await asyncio.gather(put(admin.id), put(uuid4()))
+
+    assert good.status_code == status.HTTP_200_OK
+    assert good.json()["data"]["user_id"] == str(admin.id)
+    assert bad.json()["errors"] == ["invalid project_id or user_id"]
+
+    assert group.stats()["batches"] == 1
+    assert group.stats()["items"] == 2
+
+
+async def test_grouped_puts_of_one_key(
+    asgi_client: httpx.AsyncClient, admin: UserT, monkeypatch
+):
+    auth = (admin.name, admin.password)
+    project = await db.create_project(name="project")
+
+    group = GroupCommit(webapp.flush_assignments, window=0.05, max_size=10)
+    monkeypatch.setattr(webapp, "assignment_writes", group)
+
+    def put(ends):
+        return asgi_client.put(
+            "/assignments",
+            auth=auth,
+            json={
+                "project_id": str(project.id),
+                "user_id": str(admin.id),
+                "begins": "2021-01-01",
+                "ends": ends,
+            },
+        )
+
+    first, second = await asyncio.gather(put(None), put("2021-03-01"))
+
+    assert first.json()["data"]["ends"] is None
+    assert first.json()["data"]["user"]["name"] == "admin"
+    assert second.json()["data"]["ends"] == "2021-03-01"
+    assert group.stats()["batches"] == 1
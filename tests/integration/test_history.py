@@ -0,0 +1,99 @@
+import asyncio
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
+import httpx
+import pytest
+from delorean import Delorean
+from sqlalchemy import func
+from sqlalchemy import select
+from starlette import status
+
+from main import db
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.committing,
+    pytest.mark.functional,
+]
+
+
+async def test_assignments_as_of(asgi_client: httpx.AsyncClient):
+    today = Delorean().date
+    user = await db.create_user(name="user")
+    project = await db.create_project(name="project")
+
+    before_all = datetime.now(timezone.utc)
+    await db.upsert_assignment(
+        project_id=project.id, user_id=user.id, begins=today
+    )
+    planned = datetime.now(timezone.utc)
+    await db.upsert_assignment(
+        project_id=project.id,
+        user_id=user.id,
+        begins=today,
+        ends=today + timedelta(days=7),
+    )
+
+    async def ends_as_of(as_of):
+        resp = await asgi_client.get(
+            "/assignments",
+            params={"as_of": as_of, "fields": "ends", "count": "exact"},
+        )
+        assert resp.status_code == status.HTTP_200_OK
+        data = resp.json()["data"]
+        assert resp.headers["X-Total-Count"] == str(len(data))
+        return [assignment["ends"] for assignment in data]
+
+    assert await ends_as_of(before_all.isoformat()) == []
+    assert await ends_as_of(planned.isoformat()) == [None]
+    assert await ends_as_of(datetime.now(timezone.utc).isoformat()) == [
+        str(today + timedelta(days=7))
+    ]
+    assert await ends_as_of(str(today)) == [str(today + timedelta(days=7))]
+    assert await ends_as_of(str(today - timedelta(days=1))) == []
+
+    resp = await asgi_client.get(
+        "/assignments", params={"as_of": planned.isoformat()}
+    )
+    (assignment,) = resp.json()["data"]
+    assert assignment["user"]["name"] == "user"
+    assert assignment["project"]["name"] == "project"
+
+    resp = await asgi_client.get("/assignments", params={"as_of": "never"})
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+async def test_concurrent_upserts_keep_one_current_version():
+    today = Delorean().date
+    user = await db.create_user(name="user")
+    project = await db.create_project(name="project")
+    values = {"project_id": project.id, "user_id": user.id, "begins": today}
+
+    async with db.begin_session() as first:
+        await first.execute(db._q_upsert_assignment, {**values, "ends": None})
+
+        # waits for the first transaction on the conflicting row
+        second = asyncio.create_task(
+            db.upsert_assignment(**values, ends=today + timedelta(days=7))
+        )
+        await asyncio.sleep(0.2)
+        assert not second.done()
+
+    assignment = await second
+
+    async with db.begin_session() as session:
+        result = await session.execute(
+            select(db.AssignmentHistory.ends)
+            .where(db.AssignmentHistory.assignment_id == assignment.id)
+            .where(func.upper_inf(db.AssignmentHistory.valid))
+        )
+        assert result.scalars().all() == [today + timedelta(days=7)]
+
+        result = await session.execute(
+            select(func.count()).where(
+                db.AssignmentHistory.assignment_id == assignment.id
+            )
+        )
+        assert result.scalar_one() == 2
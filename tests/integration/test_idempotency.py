@@ -0,0 +1,127 @@
+from uuid import uuid4
+
+import httpx
+import pytest
+from sqlalchemy import func
+from sqlalchemy import select
+from starlette import status
+
+from framework.idempotency import StoredResponse
+from main import db
+from main.custom_types import ProjectT
+from main.custom_types import UserT
+from main.idempotency import DbIdempotencyStore
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.functional,
+]
+
+
+async def test_retried_create_is_replayed(
+    asgi_client: httpx.AsyncClient, admin: UserT
+):
+    auth = (admin.name, admin.password)
+    headers = {"Idempotency-Key": str(uuid4())}
+    project = ProjectT(name="project")
+
+    first = await asgi_client.post(
+        "/projects", content=project.json(), auth=auth, headers=headers
+    )
+    assert first.status_code == status.HTTP_201_CREATED
+    assert "idempotent-replayed" not in first.headers
+
+    retry = await asgi_client.post(
+        "/projects", content=project.json(), auth=auth, headers=headers
+    )
+    assert retry.status_code == status.HTTP_201_CREATED
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert retry.json() == first.json()
+    assert len(await db.list_projects()) == 1
+
+    resp = await asgi_client.post(
+        "/projects",
+        content=ProjectT(name="other").json(),
+        auth=auth,
+        headers=headers,
+    )
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert resp.json() == {
+        "errors": ["Idempotency-Key is reused with a different request"]
+    }
+
+    resp = await asgi_client.post(
+        "/projects", content=project.json(), auth=auth
+    )
+    assert resp.json() == {"errors": ["project already exists"]}
+
+
+async def test_keys_are_scoped_by_credentials(
+    asgi_client: httpx.AsyncClient, admin: UserT
+):
+    headers = {"Idempotency-Key": str(uuid4())}
+    project = ProjectT(name="project").json()
+
+    resp = await asgi_client.post(
+        "/projects", content=project, headers=headers
+    )
+    assert resp.status_code == status.HTTP_401_UNAUTHORIZED
+
+    resp = await asgi_client.post(
+        "/projects",
+        content=project,
+        auth=(admin.name, admin.password),
+        headers=headers,
+    )
+    assert resp.status_code == status.HTTP_201_CREATED
+    assert "idempotent-replayed" not in resp.headers
+
+
+async def test_db_store():
+    store = DbIdempotencyStore(ttl=60)
+    response = StoredResponse(
+        fingerprint="fingerprint",
+        status=201,
+        headers=[(b"content-type", b"application/json")],
+        body=b"{}",
+    )
+
+    assert await store.get("key") is None
+
+    await store.put("key", response)
+    await store.put("key", response._replace(body=b"[]"))
+    assert await store.get("key") == response
+
+    expired = DbIdempotencyStore(ttl=-1)
+    await expired.put("expired", response)
+    assert await expired.get("expired") is None
+
+
+async def test_db_store_purges_expired_records():
+    response = StoredResponse(
+        fingerprint="fingerprint",
+        status=201,
+        headers=[],
+        body=b"{}",
+    )
+
+    expired = DbIdempotencyStore(ttl=-1, purge_batch_size=0)
+    for i in range(3):
+        await expired.put(f"expired-{i}", response)
+
+    store = DbIdempotencyStore(ttl=60, purge_batch_size=2)
+    await store.put("first", response)
+    assert await count_records() == 2
+
+    await store.put("second", response)
+    assert await count_records() == 2
+    assert await store.get("first") == response
+    assert await store.get("second") == response
+
+
+async def count_records() -> int:
+    async with db.begin_session() as session:
+        result = await session.execute(
+            select(func.count()).select_from(db.IdempotencyRecord)
+        )
+        return result.scalar_one()
@@ -0,0 +1,201 @@
+import asyncio
+from typing import AsyncGenerator
+
+import httpx
+import pytest
+from sqlalchemy import update
+from starlette import status
+
+from main import db
+from main import jobs
+from main.custom_types import UserT
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.committing,
+    pytest.mark.functional,
+]
+
+calls = []
+cancelled = []
+
+
+@jobs.job("test-echo")
+async def echo(payload):
+    calls.append(payload)
+    return {"echo": payload}
+
+
+@jobs.job("test-flaky")
+async def flaky(payload):
+    calls.append(payload)
+    if len(calls) < payload["fail_times"] + 1:
+        raise RuntimeError("flaked")
+    return len(calls)
+
+
+@pytest.fixture(scope="function")
+async def runner(monkeypatch) -> AsyncGenerator[jobs.JobRunner, None]:
+    calls.clear()
+    cancelled.clear()
+    monkeypatch.setattr(jobs.runner, "backoff", 0)
+    monkeypatch.setattr(jobs.runner, "poll_interval", 0.05)
+
+    yield jobs.runner
+
+    await jobs.runner.stop()
+
+
+async def wait_for_job(job_id, *statuses) -> db.Job:
+    for _ in range(100):
+        job = await db.get_job(job_id=job_id)
+        if job.status in statuses:
+            return job
+        await asyncio.sleep(0.02)
+
+    raise AssertionError(f"job is {job.status}")
+
+
+async def test_jobs_api(
+    asgi_client: httpx.AsyncClient, admin: UserT, runner: jobs.JobRunner
+):
+    auth = (admin.name, admin.password)
+
+    resp = await asgi_client.post(
+        "/jobs", json={"kind": "test-echo", "payload": {"x": 1}}, auth=auth
+    )
+    assert resp.status_code == status.HTTP_202_ACCEPTED
+    job = resp.json()["data"]
+    assert job["status"] == "queued"
+    assert runner.running
+
+    await wait_for_job(job["id"], "succeeded")
+
+    resp = await asgi_client.get(f"/jobs/{job['id']}", auth=auth)
+    assert resp.status_code == status.HTTP_200_OK
+    job = resp.json()["data"]
+    assert job["status"] == "succeeded"
+    assert job["result"] == {"echo": {"x": 1}}
+    assert job["attempts"] == 1
+
+    resp = await asgi_client.post("/jobs", json={"kind": "nope"}, auth=auth)
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    resp = await asgi_client.get(f"/jobs/{admin.id}", auth=auth)
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+
+    resp = await asgi_client.post("/jobs", json={"kind": "test-echo"})
+    assert resp.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+async def test_failed_jobs_are_retried(runner: jobs.JobRunner):
+    retried = await db.enqueue_job(
+        kind="test-flaky", payload={"fail_times": 2}, max_attempts=3
+    )
+    await runner.start()
+
+    retried = await wait_for_job(retried.id, "succeeded", "failed")
+    assert (retried.status, retried.attempts) == ("succeeded", 3)
+    assert retried.result == 3
+
+    calls.clear()
+    failed = await db.enqueue_job(
+        kind="test-flaky", payload={"fail_times": 5}, max_attempts=2
+    )
+    runner.wake()
+
+    failed = await wait_for_job(failed.id, "succeeded", "failed")
+    assert (failed.status, failed.attempts) == ("failed", 2)
+    assert "flaked" in failed.error
+
+
+async def test_expired_lease_is_reclaimed():
+    job = await db.enqueue_job(kind="test-echo", payload={}, max_attempts=2)
+
+    (claimed,) = await db.claim_jobs(limit=10, lease=0)
+    assert (claimed.id, claimed.attempts) == (job.id, 1)
+
+    # the first worker is gone: its lease has expired
+    (reclaimed,) = await db.claim_jobs(limit=10, lease=60)
+    assert (reclaimed.id, reclaimed.attempts) == (job.id, 2)
+    assert await db.claim_jobs(limit=10, lease=60) == []
+
+    # the late outcome of the abandoned attempt is ignored
+    assert not await db.finish_job(job=claimed, result=1)
+    assert await db.finish_job(job=reclaimed, result=2)
+    assert (await db.get_job(job_id=job.id)).result == 2
+
+
+async def test_expired_lease_at_last_attempt_fails_the_job():
+    job = await db.enqueue_job(kind="test-echo", payload={}, max_attempts=1)
+
+    (claimed,) = await db.claim_jobs(limit=10, lease=0)
+    assert claimed.id == job.id
+
+    # the worker has died running the only attempt
+    assert await db.claim_jobs(limit=10, lease=60) == []
+
+    job = await db.get_job(job_id=job.id)
+    assert (job.status, job.attempts) == ("failed", 1)
+    assert "lease has expired" in job.error
+    assert job.locked_until is None
+
+
+@jobs.job("test-slow")
+async def slow(payload):
+    calls.append(payload)
+    try:
+        await asyncio.sleep(payload["seconds"])
+    except asyncio.CancelledError:
+        cancelled.append(payload)
+        raise
+    return "done"
+
+
+async def test_lease_is_kept_while_job_runs(
+    runner: jobs.JobRunner, monkeypatch
+):
+    monkeypatch.setattr(runner, "lease", 0.3)
+
+    job = await db.enqueue_job(
+        kind="test-slow", payload={"seconds": 1}, max_attempts=3
+    )
+    await runner.start()
+    await wait_for_job(job.id, "running")
+
+    # another worker would find no abandoned job to take over
+    for _ in range(8):
+        await asyncio.sleep(0.1)
+        assert await db.claim_jobs(limit=1, lease=60) == []
+
+    job = await wait_for_job(job.id, "succeeded")
+    assert job.attempts == 1
+    assert len(calls) == 1
+
+
+async def test_lost_lease_cancels_job(runner: jobs.JobRunner, monkeypatch):
+    monkeypatch.setattr(runner, "lease", 0.3)
+
+    job = await db.enqueue_job(
+        kind="test-slow", payload={"seconds": 60}, max_attempts=3
+    )
+    await runner.start()
+    await wait_for_job(job.id, "running")
+
+    # the lease is taken over as if it had expired
+    async with db.begin_session() as session:
+        await session.execute(
+            update(db.Job)
+            .where(db.Job.id == job.id)
+            .values(attempts=db.Job.attempts + 1)
+        )
+
+    for _ in range(50):
+        if cancelled:
+            break
+        await asyncio.sleep(0.05)
+    else:
+        raise AssertionError("the attempt is still running")
+
+    job = await db.get_job(job_id=job.id)
+    assert (job.status, job.attempts) == ("running", 2)
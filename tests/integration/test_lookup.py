@@ -0,0 +1,60 @@
+from uuid import uuid4
+
+import httpx
+import pytest
+from starlette import status
+
+from main import db
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.functional,
+]
+
+
+async def test_users_lookup(asgi_client: httpx.AsyncClient):
+    alice = await db.create_user(name="alice", password="secret")
+    bob = await db.create_user(name="bob")
+    missing = uuid4()
+
+    resp = await asgi_client.get(
+        "/users",
+        params={"ids": f"{bob.id},{missing}", "ignored": "x"},
+    )
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == {
+        "data": [{"id": str(bob.id), "is_admin": False, "name": "bob"}],
+        "errors": [f"user not found: {missing}"],
+    }
+
+    resp = await asgi_client.get(
+        "/users", params=[("ids", str(alice.id)), ("ids", str(bob.id))]
+    )
+    assert resp.status_code == status.HTTP_200_OK
+    payload = resp.json()
+    assert "errors" not in payload
+    assert [user["name"] for user in payload["data"]] == ["alice", "bob"]
+    assert all("password" not in user for user in payload["data"])
+
+    resp = await asgi_client.get("/users", params={"ids": "nope"})
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert resp.json() == {"errors": ["invalid id: nope"]}
+
+
+async def test_projects_lookup(asgi_client: httpx.AsyncClient):
+    project = await db.create_project(name="project")
+    missing = uuid4()
+
+    resp = await asgi_client.post(
+        "/projects/lookup",
+        json={"ids": [str(missing), str(project.id), str(project.id)]},
+    )
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == {
+        "data": [{"id": str(project.id), "name": "project"}],
+        "errors": [f"project not found: {missing}"],
+    }
+
+    resp = await asgi_client.get("/projects", params={"ids": ""})
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == {"data": []}
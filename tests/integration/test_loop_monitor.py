@@ -0,0 +1,42 @@
+import asyncio
+
+import httpx
+import pytest
+from starlette import status
+
+from main import db
+from main import webapp
+from main.custom_types import UserT
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.committing,
+    pytest.mark.functional,
+]
+
+
+async def test_loop_and_pool_stats(
+    asgi_client: httpx.AsyncClient, admin: UserT
+):
+    auth = (admin.name, admin.password)
+    checkouts = db.checkouts.checkouts
+
+    webapp.loop_monitor.start()
+    try:
+        await asyncio.sleep(webapp.loop_monitor.interval * 2)
+        resp = await asgi_client.get("/internal/stats", auth=auth)
+    finally:
+        await webapp.loop_monitor.stop()
+
+    assert resp.status_code == status.HTTP_200_OK
+    data = resp.json()["data"]
+
+    assert data["loop"]["lag_mean"] is not None
+    assert data["loop"]["samples"] == []
+
+    pool = data["pool"]
+    # the request has authenticated the admin
+    assert pool["checkouts"] > checkouts
+    assert pool["waiting"] == 0
+    assert pool["checked_out"] == 0
+    assert pool["wait_max"] >= pool["wait_mean"] >= 0
@@ -0,0 +1,132 @@
+import importlib
+import os
+from datetime import date
+from datetime import timedelta
+from typing import AsyncGenerator
+
+import pytest
+from delorean import Delorean
+from sqlalchemy import create_engine
+from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from framework.config import settings
+from main import db
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.committing,
+    pytest.mark.functional,
+]
+
+
+@pytest.fixture(scope="function")
+async def partitioned() -> AsyncGenerator[None, None]:
+    """
+    Reloads main.db with the partitioned layout
+    on a database of its own: the layouts cannot share tables.
+    """
+    url = make_url(settings.DATABASE_URL.replace("postgres", "postgresql"))
+    name = f"{url.database}_partitioned_{os.getpid()}"
+    admin = create_engine(url, isolation_level="AUTOCOMMIT")
+
+    with admin.connect() as connection:
+        connection.execute(text(f"drop database if exists {name}"))
+        connection.execute(text(f"create database {name}"))
+
+    monkeypatch = pytest.MonkeyPatch()
+    monkeypatch.setattr(settings, "ASSIGNMENTS_PARTITIONED", True)
+    monkeypatch.setattr(
+        settings,
+        "DATABASE_URL",
+        # main.db expects the scheme of DATABASE_URL to be "postgres"
+        url.set(drivername="postgres", database=name).render_as_string(
+            hide_password=False
+        ),
+    )
+    importlib.reload(db)
+    db.create_tables()
+
+    try:
+        yield
+    finally:
+        await db.engine.dispose()
+        db.engine_sync.dispose()
+        monkeypatch.undo()
+        importlib.reload(db)
+
+        with admin.connect() as connection:
+            connection.execute(text(f"drop database if exists {name}"))
+        admin.dispose()
+
+
+async def count(table: str) -> int:
+    async with db.begin_session() as session:
+        result = await session.execute(
+            select(func.count()).select_from(text(table))
+        )
+        return result.scalar_one()
+
+
+async def test_rows_are_moved_into_new_partitions(partitioned):
+    year = Delorean().date.year + 2
+    user = await db.create_user(name="user")
+    project = await db.create_project(name="project")
+
+    await db.upsert_assignment(
+        project_id=project.id,
+        user_id=user.id,
+        begins=date(year, 6, 1),
+    )
+    assert await count("assignments_default") == 1
+
+    created = db.create_assignment_partitions(years=(year,))
+    assert created == [f"assignments_y{year}", f"assignments_archive_y{year}"]
+    assert db.create_assignment_partitions(years=(year,)) == []
+
+    assert await count("assignments_default") == 0
+    assert await count(f"assignments_y{year}") == 1
+
+    # the moved row is not a new version of the assignment
+    assert await count("assignment_history") == 1
+
+
+async def test_closed_assignments_are_archived(partitioned):
+    today = Delorean().date
+    user = await db.create_user(name="user")
+    closed = await db.create_project(name="closed")
+    current = await db.create_project(name="current")
+
+    for project, ends in (
+        (closed, today - timedelta(days=1)),
+        (current, None),
+    ):
+        await db.upsert_assignment(
+            project_id=project.id,
+            user_id=user.id,
+            begins=today - timedelta(days=30),
+            ends=ends,
+        )
+
+    result = db.purge_assignments(
+        before=today, archive=True, batch_size=1, pause=0
+    )
+    assert result.rows == 1
+
+    rows = await db.list_assignments(fields=("project_id",), expand=())
+    assert [row.project_id for row in rows] == [current.id]
+
+    async with db.begin_session() as session:
+        result = await session.execute(select(db.assignments_archive))
+        archived = result.all()
+    assert [row.project_id for row in archived] == [closed.id]
+
+    # the pair may be assigned again once its previous stint is archived
+    obj = await db.upsert_assignment(
+        project_id=closed.id,
+        user_id=user.id,
+        begins=today,
+    )
+    assert obj.project.name == "closed"
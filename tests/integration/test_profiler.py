@@ -0,0 +1,91 @@
+import asyncio
+import base64
+import time
+
+import httpx
+import pytest
+from starlette import status
+
+from framework.profiler import ProfilingMiddleware
+from framework.profiler import SamplingProfiler
+from main import db
+from main import webapp
+from main.custom_types import UserT
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.functional,
+]
+
+
+def basic_auth(name: str, password: str) -> bytes:
+    return b"Basic " + base64.b64encode(f"{name}:{password}".encode())
+
+
+async def test_profile_window(
+    asgi_client: httpx.AsyncClient, admin: UserT, tmp_path, monkeypatch
+):
+    auth = (admin.name, admin.password)
+    url = "/internal/profile?seconds=0.05"
+
+    resp = await asgi_client.post(url, auth=auth)
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+
+    profiler = SamplingProfiler(directory=tmp_path, interval=0.001)
+    monkeypatch.setattr(webapp, "profiler", profiler)
+
+    resp = await asgi_client.post(url)
+    assert resp.status_code == status.HTTP_401_UNAUTHORIZED
+
+    resp = await asgi_client.post(url, auth=auth)
+    assert resp.status_code == status.HTTP_202_ACCEPTED
+    name = resp.json()["data"]["profile"]
+
+    await asyncio.sleep(0.2)
+    assert (tmp_path / name).exists()
+
+
+async def test_profiling_is_allowed_to_admins(admin: UserT):
+    def scope(authorization: bytes):
+        return {
+            "type": "http",
+            "headers": [(b"authorization", authorization)],
+        }
+
+    assert await webapp.profiling_allowed(
+        scope(basic_auth(admin.name, admin.password))
+    )
+    assert not await webapp.profiling_allowed(
+        scope(basic_auth(admin.name, "wrong"))
+    )
+
+    await db.create_user(name="user", password="user")
+    assert not await webapp.profiling_allowed(
+        scope(basic_auth("user", "user"))
+    )
+
+
+async def test_coalesced_list_is_profiled(tmp_path, monkeypatch):
+    async def list_users():
+        # the list is built in a single-flight task, not the request's one
+        finish = time.monotonic() + 0.1
+        while time.monotonic() < finish:
+            pass
+        return []
+
+    monkeypatch.setattr(db, "list_users", list_users)
+
+    async def allow(_scope) -> bool:
+        return True
+
+    profiler = SamplingProfiler(directory=tmp_path, interval=0.001)
+    app = ProfilingMiddleware(
+        webapp.application, profiler=profiler, authorize=allow
+    )
+
+    async with httpx.AsyncClient(app=app, base_url="http://asgi") as client:
+        resp = await client.get("/users", headers={"X-Profile": "1"})
+
+    assert resp.status_code == status.HTTP_200_OK
+    profile = (tmp_path / resp.headers["X-Profile"]).read_text()
+    assert "test_profiler.list_users" in profile
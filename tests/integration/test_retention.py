@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+import pytest
+from delorean import Delorean
+from sqlalchemy import func
+from sqlalchemy import select
+
+from main import db
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.committing,
+    pytest.mark.functional,
+]
+
+
+async def create_assignments(ends):
+    project = await db.create_project(name="project")
+    today = Delorean().date
+
+    for i, days_ago in enumerate(ends):
+        user = await db.create_user(name=f"user{i}")
+        await db.upsert_assignment(
+            project_id=project.id,
+            user_id=user.id,
+            begins=today - timedelta(days=400),
+            ends=None if days_ago is None else today - timedelta(days_ago),
+        )
+
+    return today
+
+
+async def count(table) -> int:
+    async with db.begin_session() as session:
+        result = await session.execute(select(func.count()).select_from(table))
+        return result.scalar_one()
+
+
+@pytest.mark.parametrize("archive", [True, False])
+async def test_purge_in_batches(archive):
+    today = await create_assignments([300, 200, 100, 50, 40, 10, None])
+
+    result = db.purge_assignments(
+        before=today - timedelta(days=30),
+        archive=archive,
+        batch_size=2,
+        pause=0,
+    )
+    assert (result.rows, result.batches) == (5, 3)
+    assert result.rows_per_second > 0
+
+    assert await count(db.Assignment.__table__) == 2
+    assert await count(db.assignments_archive) == (5 if archive else 0)
+
+    result = db.purge_assignments(
+        before=today - timedelta(days=30),
+        archive=archive,
+        batch_size=2,
+        pause=0,
+    )
+    assert (result.rows, result.batches) == (0, 0)
@@ -0,0 +1,49 @@
+import httpx
+import pytest
+from starlette import status
+
+from main import db
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.functional,
+]
+
+
+async def test_projects_search(asgi_client: httpx.AsyncClient):
+    for name in ("legacy billing", "billing", "billing-v2", "payroll"):
+        await db.create_project(name=name)
+
+    resp = await asgi_client.get("/projects", params={"q": "BILLING"})
+    assert resp.status_code == status.HTTP_200_OK
+    names = [project["name"] for project in resp.json()["data"]]
+    # prefix matches go first
+    assert names[:2] == ["billing", "billing-v2"]
+    assert set(names) >= {"billing", "billing-v2", "legacy billing"}
+    assert "payroll" not in names
+
+    resp = await asgi_client.get("/projects", params={"q": "bill", "limit": 1})
+    assert resp.status_code == status.HTTP_200_OK
+    assert [project["name"] for project in resp.json()["data"]] == ["billing"]
+
+    resp = await asgi_client.get("/projects", params={"q": "%"})
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == {"data": []}
+
+    resp = await asgi_client.get("/projects", params={"q": ""})
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    resp = await asgi_client.get("/projects", params={"q": "x", "limit": 0})
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+async def test_users_search(asgi_client: httpx.AsyncClient):
+    await db.create_user(name="alice", password="secret")
+    await db.create_user(name="malice")
+    await db.create_user(name="bob")
+
+    resp = await asgi_client.get("/users", params={"q": "alic"})
+    assert resp.status_code == status.HTTP_200_OK
+    users = resp.json()["data"]
+    assert [user["name"] for user in users][:2] == ["alice", "malice"]
+    assert all("password" not in user for user in users)
@@ -0,0 +1,82 @@
+import pytest
+from starlette import status
+
+from framework.config import settings
+from framework.shared_snapshot import SnapshotReader
+from main import db
+from main import shared_cache
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.committing,
+    pytest.mark.functional,
+]
+
+
+@pytest.fixture(scope="function", autouse=True)
+def snapshots(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SHARED_CACHE_PATH", str(tmp_path))
+    monkeypatch.setattr(
+        shared_cache,
+        "readers",
+        {
+            name: SnapshotReader(shared_cache.snapshot_path(name))
+            for name in shared_cache.COLUMNS
+        },
+    )
+
+
+async def test_served_from_snapshot(asgi_client, monkeypatch):
+    project = await db.create_project(name="project")
+    user = await db.create_user(name="user", password="secret")
+
+    shared_cache.refresh()
+    assert b"secret" not in shared_cache.snapshot_path("users").read_bytes()
+
+    async def fail(**_kwargs):
+        raise AssertionError("the db is not expected to be read")
+
+    monkeypatch.setattr(db, "get_project", fail)
+    monkeypatch.setattr(db, "get_users", fail)
+
+    resp = await asgi_client.get(f"/projects/{project.id}")
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json()["data"] == {"id": str(project.id), "name": "project"}
+
+    resp = await asgi_client.get(f"/users?ids={user.id}")
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json()["data"] == [
+        {"id": str(user.id), "name": "user", "is_admin": False}
+    ]
+
+
+async def test_stale_snapshot_is_not_served(asgi_client):
+    await db.create_project(name="first")
+    shared_cache.refresh()
+    assert shared_cache.stats()["projects"]["fresh"]
+
+    # the worker knows about a write the snapshot does not include
+    await db.create_project(name="second")
+    assert shared_cache.list_all("projects") is None
+    assert not shared_cache.stats()["projects"]["fresh"]
+
+    resp = await asgi_client.get("/projects")
+    assert sorted(obj["name"] for obj in resp.json()["data"]) == [
+        "first",
+        "second",
+    ]
+
+    shared_cache.refresh()
+    assert sorted(obj.name for obj in shared_cache.list_all("projects")) == [
+        "first",
+        "second",
+    ]
+
+
+async def test_old_snapshot_is_not_served(monkeypatch):
+    await db.create_project(name="project")
+    shared_cache.refresh()
+    assert shared_cache.list_all("projects") is not None
+
+    monkeypatch.setattr(settings, "SHARED_CACHE_MAX_AGE", -1)
+    assert shared_cache.list_all("projects") is None
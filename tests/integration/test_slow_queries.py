@@ -0,0 +1,85 @@
+import httpx
+import pytest
+from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy import text
+from starlette import status
+
+from main import db
+from main.custom_types import UserT
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.functional,
+]
+
+
+@pytest.fixture(scope="function")
+def log_everything(monkeypatch):
+    monkeypatch.setattr(db.slow_queries, "threshold", 0)
+    monkeypatch.setattr(db.slow_queries, "sample_rate", 1)
+
+
+async def test_slow_queries_are_recorded(
+    asgi_client: httpx.AsyncClient, admin: UserT, log_everything
+):
+    user = await db.create_user(name="someone", password="secret")
+    await db.get_user(user_id=user.id)
+
+    entries = db.slow_queries.recent()
+
+    select_user = next(
+        entry
+        for entry in entries
+        if entry["statement"].startswith("SELECT users.id")
+    )
+    assert select_user["caller"].startswith("main.db.get_user:")
+    assert select_user["parameters"] == {
+        "param_1": 1,
+        "user_id": str(user.id),
+    }
+    assert select_user["plan"][0]["Plan"]["Actual Loops"] == 1
+    assert select_user["duration_ms"] >= 0
+
+    insert_user = next(
+        entry
+        for entry in entries
+        if entry["statement"].startswith("INSERT INTO users")
+    )
+    assert insert_user["caller"].startswith("main.db.create_user:")
+    assert insert_user["parameters"]["password"] == "***"
+    assert "plan" not in insert_user
+
+    auth = (admin.name, admin.password)
+    resp = await asgi_client.get("/internal/slow-queries", auth=auth)
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json()["data"]
+
+    resp = await asgi_client.get("/internal/slow-queries")
+    assert resp.status_code != status.HTTP_200_OK
+
+
+async def test_side_effects_are_not_repeated(log_everything):
+    next_id = select(func.nextval(db.changes_seq.name))
+
+    async with db.begin_session() as session:
+        first = (await session.execute(next_id)).scalar_one()
+        second = (await session.execute(next_id)).scalar_one()
+        await session.execute(text("select set_config('x.y', 'z', true)"))
+        setting = await session.execute(
+            text("select current_setting('x.y', true)")
+        )
+        assert setting.scalar_one() == "z"
+
+    assert second == first + 1
+
+    entries = db.slow_queries.recent()
+    nextval = next(
+        entry for entry in entries if "nextval" in entry["statement"]
+    )
+    assert nextval["plan"] is None
+
+    set_config = next(
+        entry for entry in entries if "set_config" in entry["statement"]
+    )
+    assert "plan" not in set_config
@@ -0,0 +1,100 @@
+from typing import AsyncGenerator
+
+import httpx
+import pytest
+from delorean import Delorean
+from starlette import status
+
+from main import db
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.functional,
+]
+
+
+@pytest.fixture(scope="function")
+async def assignment() -> AsyncGenerator[db.Assignment, None]:
+    user = await db.create_user(name="user")
+    project = await db.create_project(name="project")
+    obj = await db.upsert_assignment(
+        project_id=project.id,
+        user_id=user.id,
+        begins=Delorean().date,
+    )
+
+    yield obj
+
+
+async def test_full_assignments_by_default(
+    asgi_client: httpx.AsyncClient, assignment: db.Assignment
+):
+    resp = await asgi_client.get("/assignments")
+    assert resp.status_code == status.HTTP_200_OK
+
+    data = resp.json()["data"]
+    assert len(data) == 1
+    assert set(data[0]) == {
+        "begins",
+        "ends",
+        "project",
+        "project_id",
+        "user",
+        "user_id",
+    }
+    assert data[0]["user"]["id"] == str(assignment.user_id)
+    assert data[0]["project"]["name"] == "project"
+
+
+async def test_sparse_fields_and_expansion(
+    asgi_client: httpx.AsyncClient, assignment: db.Assignment
+):
+    resp = await asgi_client.get(
+        "/assignments", params={"fields": "user_id,begins"}
+    )
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == {
+        "data": [
+            {
+                "user_id": str(assignment.user_id),
+                "begins": assignment.begins.isoformat(),
+            }
+        ]
+    }
+
+    resp = await asgi_client.get(
+        "/assignments", params={"fields": "ends", "expand": "project"}
+    )
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == {
+        "data": [
+            {
+                "project": {
+                    "id": str(assignment.project_id),
+                    "name": "project",
+                },
+                "ends": None,
+            }
+        ]
+    }
+
+    resp = await asgi_client.get("/assignments", params={"expand": "user"})
+    assert resp.status_code == status.HTTP_200_OK
+    assert set(resp.json()["data"][0]) == {
+        "begins",
+        "ends",
+        "project_id",
+        "user",
+        "user_id",
+    }
+
+
+async def test_unknown_fields(asgi_client: httpx.AsyncClient):
+    resp = await asgi_client.get("/assignments", params={"fields": "id,x"})
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert resp.json() == {"errors": ["unknown names: id, x"]}
+
+    resp = await asgi_client.get(
+        "/assignments", params={"fields": "", "expand": ""}
+    )
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -0,0 +1,85 @@
+import httpx
+import pytest
+from sqlalchemy import Column
+from sqlalchemy import Integer
+from sqlalchemy import MetaData
+from sqlalchemy import Table
+from sqlalchemy import text
+from starlette import status
+
+from main import db
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.functional,
+]
+
+
+async def test_exact_total_count(asgi_client: httpx.AsyncClient):
+    for name in ("a", "b", "c"):
+        await db.create_project(name=name)
+
+    resp = await asgi_client.get("/projects", params={"count": "exact"})
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.headers["x-total-count"] == "3"
+    assert len(resp.json()["data"]) == 3
+
+    await db.create_project(name="d")
+
+    resp = await asgi_client.head("/projects", params={"count": "exact"})
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.headers["x-total-count"] == "4"
+    assert resp.content == b""
+
+
+async def test_estimated_total_count(asgi_client: httpx.AsyncClient):
+    for path in ("/users", "/projects", "/assignments"):
+        resp = await asgi_client.head(path)
+        assert resp.status_code == status.HTTP_200_OK
+        assert int(resp.headers["x-total-count"]) >= 0
+
+        resp = await asgi_client.get(path)
+        assert resp.status_code == status.HTTP_200_OK
+        assert int(resp.headers["x-total-count"]) >= 0
+
+    resp = await asgi_client.head("/users", params={"count": "maybe"})
+    assert resp.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.parametrize("name", ["nobody", "a:b", "50%", "it's"])
+async def test_filtered_estimate(name):
+    where = db.User.name == name
+    assert await db.count_rows(db.User.__table__, where=where) >= 0
+    assert await db.count_rows(db.User.__table__, where=where, exact=True) == 0
+
+
+async def test_estimate_of_small_table(asgi_client: httpx.AsyncClient):
+    for name in ("a", "b", "c"):
+        await db.create_project(name=name)
+
+    resp = await asgi_client.get("/projects")
+    assert int(resp.headers["x-total-count"]) > 0
+
+
+async def test_estimate_follows_table_size():
+    table = Table("estimated", MetaData(), Column("id", Integer))
+
+    async def insert_rows(rows: int) -> None:
+        async with db.begin_session() as session:
+            await session.execute(
+                text("insert into estimated select generate_series(1, :rows)"),
+                {"rows": rows},
+            )
+
+    async with db.begin_session() as session:
+        await session.execute(text("create table estimated (id int)"))
+    await insert_rows(1000)
+
+    # never measured: counted exactly
+    assert await db.count_rows(table) == 1000
+
+    async with db.begin_session() as session:
+        await session.execute(text("analyze estimated"))
+    await insert_rows(1000)
+
+    assert 1500 < await db.count_rows(table) < 2500